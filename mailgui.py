@@ -10,21 +10,30 @@ import imaplib
 import poplib
 import smtplib
 import email
+import email.parser
 import email.utils
 import ssl
 import os
+import re
 import sys
 import json
 import sqlite3
+import socket
 import threading
+import time
 import argparse
 import base64
+import codecs
+import concurrent.futures
+import functools
 import getpass
+import platform
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
-from email.header import decode_header
+from email.header import Header, decode_header
 from email.utils import parseaddr
 from cryptography.fernet import Fernet
 
@@ -61,6 +70,32 @@ if not os.path.exists(CONFIG_FILE):
 # Encryption key file (stored next to config)
 KEY_FILE = os.path.join(os.path.dirname(CONFIG_FILE), ".mailgui.key")
 
+# Shared TLS context for SMTP with "verify_ssl": loads the CA bundle once and
+# verifies the server
+_SMTP_CTX = ssl.create_default_context()
+
+# Shared non-verifying context for every other TLS connection: the same settings
+# imaplib, poplib and smtplib build per connection when no context is passed
+# (config "verify_ssl" defaults to False), constructed only once
+_NOVERIFY_CTX = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+_NOVERIFY_CTX.check_hostname = False
+_NOVERIFY_CTX.verify_mode = ssl.CERT_NONE
+
+# IMAP FETCH response parsing; separate patterns since servers order UID/FLAGS differently
+_UID_RE = re.compile(rb"UID (\d+)")
+_FLAGS_RE = re.compile(rb"FLAGS \(([^)]*)\)")
+
+# Parsers shared by every fetch (stateless, so safe across threads). The header
+# parser stops at the blank line instead of building a body payload
+_PARSER = email.parser.BytesParser()
+_HEADER_PARSER = email.parser.BytesHeaderParser()
+
+# Re-issue IMAP IDLE before servers' ~10 minute inactivity cutoff (RFC 2177 allows 29)
+_IDLE_RESTART = 9 * 60
+
+# Mail list rows inserted per Tk idle callback, see MailGUI._insert_rows
+_LIST_CHUNK = 50
+
 
 def _get_or_create_key():
     """Get or create encryption key"""
@@ -78,13 +113,37 @@ def _get_or_create_key():
         return key
 
 
+# KEY_FILE path -> Fernet, so the key file is read and the cipher keyed once
+_FERNET_CACHE = {}
+
+
+def _get_fernet():
+    """Return the Fernet instance for the current KEY_FILE"""
+    f = _FERNET_CACHE.get(KEY_FILE)
+    if f is None:
+        f = _FERNET_CACHE[KEY_FILE] = Fernet(_get_or_create_key())
+    return f
+
+
+def _aes_ni_available(cpuinfo="/proc/cpuinfo"):
+    """True/False if the CPU's AES-NI flag can be read (x86 Linux), else None"""
+    if not sys.platform.startswith("linux") or platform.machine() not in ("x86_64", "i686", "i386"):
+        return None
+    try:
+        with open(cpuinfo, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return "aes" in line.split(":", 1)[1].split()
+    except OSError:
+        return None
+    return None
+
+
 def _encrypt_password(password):
     """Encrypt password using Fernet"""
     if not password:
         return ""
-    key = _get_or_create_key()
-    f = Fernet(key)
-    return f.encrypt(password.encode()).decode()
+    return _get_fernet().encrypt(password.encode()).decode()
 
 
 def _decrypt_password(encrypted_password):
@@ -92,22 +151,79 @@ def _decrypt_password(encrypted_password):
     if not encrypted_password:
         return ""
     try:
-        key = _get_or_create_key()
-        f = Fernet(key)
-        return f.decrypt(encrypted_password.encode()).decode()
+        return _get_fernet().decrypt(encrypted_password.encode()).decode()
     except Exception:
         # If decryption fails, assume it's plain text (for backward compatibility)
         return encrypted_password
 
 
+# MailCache statements, one constant each so every call hits sqlite3's
+# per-connection prepared-statement cache with the same SQL text
+_INSERT_EMAIL_SQL = (
+    "INSERT OR IGNORE INTO emails "
+    "(account, folder, uid, flags, from_addr, subject, date_str, date_ts) "
+    "VALUES (?,?,?,?,?,?,?,?)")
+_INSERT_RAW_SQL = "INSERT OR IGNORE INTO emails_raw (account, folder, uid, raw) VALUES (?,?,?,?)"
+_LOAD_LIST_SQL = (
+    "SELECT uid, flags, from_addr, subject, date_str FROM emails "
+    "WHERE account=? AND folder=? ORDER BY date_ts DESC, rowid DESC")
+_LOAD_RAW_SQL = "SELECT raw FROM emails_raw WHERE account=? AND folder=? AND uid=?"
+_GET_UIDS_SQL = "SELECT uid FROM emails WHERE account=? AND folder=?"
+# POP3 UIDLs share the table; CAST would read "123abc" as 123, so digits only
+_MAX_UID_SQL = (
+    "SELECT MAX(CAST(uid AS INTEGER)) FROM emails "
+    "WHERE account=? AND folder=? AND uid NOT GLOB '*[^0-9]*'")
+# Only for a message that is in the list table, like the UPDATE it replaces
+_STORE_RAW_SQL = (
+    "INSERT OR REPLACE INTO emails_raw (account, folder, uid, raw) "
+    "SELECT account, folder, uid, ? FROM emails WHERE account=? AND folder=? AND uid=?")
+_DELETE_EMAIL_SQL = "DELETE FROM emails WHERE account=? AND folder=? AND uid=?"
+_DELETE_RAW_SQL = "DELETE FROM emails_raw WHERE account=? AND folder=? AND uid=?"
+
+
+def _date_ts(date_str):
+    """Epoch seconds of an RFC 2822 Date header, 0 if missing or unparseable."""
+    try:
+        return int(email.utils.parsedate_to_datetime(date_str).timestamp())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return 0
+
+
 class MailCache:
     """SQLite persistent cache for email messages."""
 
-    def __init__(self):
-        db_path = os.path.join(os.path.dirname(CONFIG_FILE), "mail_cache.db")
-        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+    def __init__(self, db_path=None):
+        if db_path is None:
+            db_path = os.path.join(os.path.dirname(CONFIG_FILE), "mail_cache.db")
+        # Autocommit mode: reads never sit in an implicit transaction, and writes
+        # are grouped explicitly by _transaction. timeout= is SQLite's busy
+        # timeout, so a write waits up to 5 s for another connection's lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False,
+                                    isolation_level=None, timeout=5)
         self.lock = threading.Lock()
         self.conn.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent with NORMAL sync; only the last commits can be lost on power failure
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-40000")  # ~40 MB page cache
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        with self._transaction():
+            self._create_schema()
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the lock and run the block as one BEGIN IMMEDIATE ... COMMIT,
+        rolled back if it raises."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _create_schema(self):
         self.conn.execute("""CREATE TABLE IF NOT EXISTS emails (
             account TEXT NOT NULL,
             folder TEXT NOT NULL,
@@ -116,58 +232,171 @@ class MailCache:
             from_addr TEXT DEFAULT '',
             subject TEXT DEFAULT '',
             date_str TEXT DEFAULT '',
-            raw BLOB,
+            date_ts INTEGER DEFAULT 0,
             PRIMARY KEY (account, folder, uid)
         )""")
-        self.conn.commit()
+        # Message bodies live apart so list scans never page through large BLOBs
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS emails_raw (
+            account TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            raw BLOB NOT NULL,
+            PRIMARY KEY (account, folder, uid)
+        )""")
+        self._migrate()
+        # The primary key already indexes (account, folder, uid) for the UID
+        # lookups; this one lets load_list read a folder in date order
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_emails_date "
+                          "ON emails(account, folder, date_ts)")
+
+    def _migrate(self):
+        """Bring caches created by older versions up to the current schema."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(emails)")}
+        if "date_ts" not in columns:
+            self.conn.execute("ALTER TABLE emails ADD COLUMN date_ts INTEGER DEFAULT 0")
+            rows = self.conn.execute("SELECT rowid, date_str FROM emails").fetchall()
+            self.conn.executemany("UPDATE emails SET date_ts=? WHERE rowid=?",
+                                  ((_date_ts(d), rowid) for rowid, d in rows))
+        if "raw" in columns:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO emails_raw (account, folder, uid, raw) "
+                "SELECT account, folder, uid, raw FROM emails WHERE raw IS NOT NULL")
+            try:
+                self.conn.execute("ALTER TABLE emails DROP COLUMN raw")
+            except sqlite3.OperationalError:
+                # SQLite before 3.35 cannot drop columns; leave it empty instead
+                self.conn.execute("UPDATE emails SET raw=NULL")
+
+    def load_list(self, account, folder, row_factory=None):
+        """Return list of (uid, flags, from_addr, subject, date_str).
 
-    def load_list(self, account, folder):
-        """Return list of (uid, flags, from_addr, subject, date_str)."""
+        row_factory(cursor, row), if given, builds each list item straight
+        from the fetched row instead of keeping the tuple.
+        """
         with self.lock:
-            cur = self.conn.execute(
-                "SELECT uid, flags, from_addr, subject, date_str FROM emails "
-                "WHERE account=? AND folder=? ORDER BY rowid DESC",
-                (account, folder))
+            cur = self.conn.cursor()
+            cur.row_factory = row_factory
+            cur.execute(_LOAD_LIST_SQL, (account, folder))
             return cur.fetchall()
 
     def load_raw(self, account, folder, uid):
         """Load raw email bytes."""
         with self.lock:
-            cur = self.conn.execute(
-                "SELECT raw FROM emails WHERE account=? AND folder=? AND uid=?",
-                (account, folder, uid))
+            cur = self.conn.execute(_LOAD_RAW_SQL, (account, folder, uid))
             row = cur.fetchone()
             return row[0] if row else None
 
     def get_uids(self, account, folder):
         """Get set of cached UIDs."""
         with self.lock:
-            cur = self.conn.execute(
-                "SELECT uid FROM emails WHERE account=? AND folder=?",
-                (account, folder))
+            cur = self.conn.execute(_GET_UIDS_SQL, (account, folder))
             return {row[0] for row in cur.fetchall()}
 
+    def max_uid(self, account, folder):
+        """Get highest cached numeric (IMAP) UID, or 0 if none."""
+        with self.lock:
+            cur = self.conn.execute(_MAX_UID_SQL, (account, folder))
+            return cur.fetchone()[0] or 0
+
     def store_batch(self, account, folder, messages):
         """Store messages. messages: list of (uid, flags, from_addr, subject, date_str, raw)."""
-        with self.lock:
+        if not messages:
+            return
+        # One transaction for the whole batch, rolled back if any row fails
+        with self._transaction():
+            # Rows are bound as they are generated; no second list of tuples with raw blobs
+            self.conn.executemany(
+                _INSERT_EMAIL_SQL, ((account, folder, *m[:5], _date_ts(m[4])) for m in messages))
             self.conn.executemany(
-                "INSERT OR IGNORE INTO emails "
-                "(account, folder, uid, flags, from_addr, subject, date_str, raw) "
-                "VALUES (?,?,?,?,?,?,?,?)",
-                [(account, folder, *m) for m in messages])
-            self.conn.commit()
+                _INSERT_RAW_SQL, ((account, folder, m[0], m[5]) for m in messages if m[5] is not None))
 
-    def delete(self, account, folder, uid):
+    def store_raw(self, account, folder, uid, raw):
+        """Fill in the raw bytes of a message stored header-only."""
         with self.lock:
-            self.conn.execute(
-                "DELETE FROM emails WHERE account=? AND folder=? AND uid=?",
-                (account, folder, uid))
-            self.conn.commit()
+            self.conn.execute(_STORE_RAW_SQL, (raw, account, folder, uid))
+
+    def delete(self, account, folder, uid):
+        with self._transaction():
+            self.conn.execute(_DELETE_EMAIL_SQL, (account, folder, uid))
+            self.conn.execute(_DELETE_RAW_SQL, (account, folder, uid))
 
     def close(self):
         self.conn.close()
 
 
+@dataclass
+class CachedMsg:
+    """Mail list entry with decoded headers, lowercased copies for search and
+    the truncated column texts shown in the list."""
+    uid: str
+    flags: str
+    from_str: str
+    subject: str
+    date_str: str
+    from_lower: str = field(init=False)
+    subject_lower: str = field(init=False)
+    display_from: str = field(init=False)
+    display_subject: str = field(init=False)
+    display_date: str = field(init=False)
+
+    def __post_init__(self):
+        self.from_lower = self.from_str.lower()
+        self.subject_lower = self.subject.lower()
+        self.display_from = self.from_str[:40]
+        self.display_subject = self.subject[:80]
+        self.display_date = self.date_str[:25]
+
+
+def _cached_msg_row(cursor, row):
+    """sqlite3 row factory turning MailCache.load_list rows into CachedMsg."""
+    return CachedMsg(*row)
+
+
+def _idle_lines(sock, stop):
+    """Yield CRLF-delimited lines read from sock, or None each second while waiting."""
+    buf = b""
+    while not stop.is_set():
+        try:
+            chunk = sock.recv(4096)
+        except socket.timeout:
+            yield None
+            continue
+        if not chunk:
+            raise ConnectionError("IMAP server closed the IDLE connection")
+        buf += chunk
+        *lines, buf = buf.split(b"\r\n")
+        yield from lines
+
+
+@functools.lru_cache(maxsize=64)
+def _lookup_codec(name):
+    # Keyed by the normalized label and bounded, since labels come from senders
+    try:
+        info = codecs.lookup(name)
+    except LookupError:
+        info = None
+    # base64, hex, rot13, zlib etc. are registered codecs but not text encodings
+    if info is None or not getattr(info, "_is_text_encoding", True):
+        info = codecs.lookup("utf-8")
+    if info.name in ("iso8859-1", "ascii"):
+        info = codecs.lookup("cp1252")
+    return info
+
+
+def _codec(charset):
+    """Resolve a MIME charset label to a codec, caching the registry lookup.
+
+    Text labelled ISO-8859-1/US-ASCII is very often really Windows-1252
+    (smart quotes, euro sign), so those labels decode as cp1252. Unknown
+    labels and non-text codecs fall back to UTF-8 instead of raising.
+    """
+    return _lookup_codec((charset or "utf-8").strip().strip("\"'").lower())
+
+
+def _decode_bytes(data, charset):
+    return _codec(charset).decode(data, "replace")[0]
+
+
 def _decode_header(s):
     if not s:
         return ""
@@ -175,43 +404,54 @@ def _decode_header(s):
     result = []
     for data, charset in parts:
         if isinstance(data, bytes):
-            result.append(data.decode(charset or "utf-8", errors="replace"))
+            result.append(_decode_bytes(data, charset))
         else:
             result.append(data)
     return "".join(result)
 
 
 def _get_body(msg):
+    if not msg.is_multipart():
+        # Flat message: no walk, and nothing to show unless it is text
+        if msg.get_content_maintype() != "text":
+            return "", ""
+        payload = msg.get_payload(decode=True)
+        if not payload:
+            return "", ""
+        decoded = _decode_bytes(payload, msg.get_content_charset())
+        if msg.get_content_subtype() == "html":
+            return "", decoded
+        return decoded, ""
     text_body = ""
     html_body = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            ct = part.get_content_type()
-            disp = str(part.get("Content-Disposition", ""))
-            if "attachment" in disp:
+    for part in msg.walk():
+        ct = part.get_content_type()
+        if ct == "text/plain":
+            if text_body:
                 continue
-            payload = part.get_payload(decode=True)
-            if payload is None:
+        elif ct == "text/html":
+            if html_body:
                 continue
-            charset = part.get_content_charset() or "utf-8"
-            decoded = payload.decode(charset, errors="replace")
-            if ct == "text/plain" and not text_body:
-                text_body = decoded
-            elif ct == "text/html" and not html_body:
-                html_body = decoded
-    else:
-        payload = msg.get_payload(decode=True)
-        if payload:
-            charset = msg.get_content_charset() or "utf-8"
-            decoded = payload.decode(charset, errors="replace")
-            if msg.get_content_type() == "text/html":
-                html_body = decoded
-            else:
-                text_body = decoded
+        else:
+            continue
+        disp = str(part.get("Content-Disposition", ""))
+        if "attachment" in disp:
+            continue
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            continue
+        decoded = _decode_bytes(payload, part.get_content_charset())
+        if ct == "text/plain":
+            text_body = decoded
+        else:
+            html_body = decoded
+        if text_body and html_body:
+            break
     return text_body, html_body
 
 
 def _get_attachments(msg):
+    """List attachment parts without decoding them; see _attachment_data."""
     attachments = []
     if not msg.is_multipart():
         return attachments
@@ -222,21 +462,116 @@ def _get_attachments(msg):
         filename = part.get_filename()
         if filename:
             filename = _decode_header(filename)
-            data = part.get_payload(decode=True)
+            payload = part.get_payload()
+            size = len(payload) if isinstance(payload, str) else 0
+            if part.get("Content-Transfer-Encoding", "").strip().lower() == "base64":
+                size = size * 3 // 4  # estimate from the encoded length
             attachments.append({
                 "filename": filename,
                 "content_type": part.get_content_type(),
-                "size": len(data) if data else 0,
-                "data": data,
+                "size": size,
+                "part": part,
             })
     return attachments
 
 
+def _attachment_data(att):
+    """Attachment bytes, decoding mail parts only when they are saved."""
+    if "part" in att:
+        return att["part"].get_payload(decode=True) or b""
+    return att["data"] or b""
+
+
+def _attachment_path(folder, filename):
+    """Join an attachment filename onto folder, dropping any directory parts."""
+    name = os.path.basename(filename.replace("\\", "/"))
+    if name in ("", ".", ".."):
+        name = "unnamed"
+    return os.path.join(folder, name)
+
+
+def _attachment_paths(folder, filenames):
+    """_attachment_path for each filename, numbering repeats as "name (1).ext"."""
+    paths = []
+    seen = set()
+    for filename in filenames:
+        path = _attachment_path(folder, filename)
+        root, ext = os.path.splitext(path)
+        n = 0
+        while os.path.normcase(path) in seen:
+            n += 1
+            path = f"{root} ({n}){ext}"
+        seen.add(os.path.normcase(path))
+        paths.append(path)
+    return paths
+
+
+def _attachment_part(path):
+    """Build a base64 attachment part, encoding the file block by block.
+
+    The whole file is never held in memory alongside its encoding; only
+    the base64 text is accumulated.
+    """
+    chunks = []
+    with open(path, "rb") as f:
+        # 57 input bytes -> one 76-char base64 line, so blocks join cleanly
+        while block := f.read(57 * 1024):
+            chunks.append(base64.encodebytes(block).decode("ascii"))
+    part = MIMEBase("application", "octet-stream")
+    part.set_payload("".join(chunks))
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
+    return part
+
+
+def _build_plain_message(from_hdr, to, subject, body, cc=None):
+    """Serialize a single-part text/plain message straight to bytes.
+
+    Skips email.mime/email.generator for the common no-attachment case.
+    Returns None when the message can't be expressed this way (non-ASCII
+    addresses, embedded newlines or over-long lines); callers then fall
+    back to building a MIME message.
+    """
+    if not from_hdr.isascii() or not to.isascii() or (cc and not cc.isascii()):
+        return None
+    if subject.isascii():
+        subject_hdr = subject
+    else:
+        subject_hdr = Header(subject, "utf-8").encode(linesep="\r\n")
+    headers = [f"From: {from_hdr}", f"To: {to}"]
+    if cc:
+        headers.append(f"Cc: {cc}")
+    headers.append(f"Subject: {subject_hdr}")
+    for header in headers:
+        # Only folded continuation lines may contain CRLF; anything else is header injection
+        unfolded = header.replace("\r\n ", "")
+        if "\r" in unfolded or "\n" in unfolded:
+            return None
+        if any(len(line) > 998 for line in header.split("\r\n")):
+            return None
+
+    body = body.replace("\r\n", "\n").replace("\r", "\n").replace("\n", "\r\n")
+    data = body.encode("utf-8")
+    if any(len(line) > 998 for line in data.split(b"\r\n")):
+        return None
+    cte = "7bit" if body.isascii() else "8bit"
+    headers += [
+        "MIME-Version: 1.0",
+        "Content-Type: text/plain; charset=utf-8",
+        f"Content-Transfer-Encoding: {cte}",
+    ]
+    return "\r\n".join(headers).encode("ascii") + b"\r\n\r\n" + data
+
+
 class MailConfig:
     def __init__(self):
         self.data = {}
+        self._saved = None  # plaintext snapshot of what is on disk
         self.load()
 
+    def _snapshot(self):
+        return json.dumps(self.data, sort_keys=True, ensure_ascii=False)
+
     def load(self):
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, "r", encoding="utf-8") as f:
@@ -249,6 +584,7 @@ class MailConfig:
                 if msgtool.get("password"):
                     msgtool["password"] = _decrypt_password(msgtool["password"])
                     self.data["msgtool"] = msgtool
+            self._saved = self._snapshot()
         else:
             # 自動建立預設 config
             self.data = {
@@ -264,6 +600,10 @@ class MailConfig:
             self.save()
 
     def save(self):
+        # Nothing changed since the last load/save: skip re-encrypting and rewriting
+        snapshot = self._snapshot()
+        if snapshot == self._saved:
+            return
         # Create a copy of data for saving
         save_data = self.data.copy()
         # Encrypt password before saving
@@ -276,11 +616,16 @@ class MailConfig:
             msgtool["password"] = _encrypt_password(msgtool["password"])
             save_data["msgtool"] = msgtool
 
-        with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-            json.dump(save_data, f, indent=2, ensure_ascii=False)
-
-        # Set file permissions to read/write for owner only
-        os.chmod(CONFIG_FILE, 0o600)
+        # Write to a temp file (owner read/write only) and swap it in, so a
+        # crash mid-write never leaves a truncated config behind
+        text = json.dumps(save_data, indent=2, ensure_ascii=False)
+        tmp = CONFIG_FILE + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, CONFIG_FILE)
+        self._saved = snapshot
 
     def get(self, key, default=""):
         return self.data.get(key, default)
@@ -423,9 +768,9 @@ class SettingsDialog(tk.Toplevel):
             port = int(self.smtp_port.get().strip())
             if self.smtp_starttls.get():
                 s = smtplib.SMTP(host, port, timeout=10)
-                s.starttls()
+                s.starttls(context=_NOVERIFY_CTX)
             else:
-                s = smtplib.SMTP_SSL(host, port, timeout=10)
+                s = smtplib.SMTP_SSL(host, port, timeout=10, context=_NOVERIFY_CTX)
             s.login(email, password)
             s.quit()
             results.append(f"SMTP ({host}:{port}): OK")
@@ -439,7 +784,7 @@ class SettingsDialog(tk.Toplevel):
                 host = self.pop3_host.get().strip()
                 port = int(self.pop3_port.get().strip())
                 if self.pop3_ssl.get():
-                    M = poplib.POP3_SSL(host, port, timeout=10)
+                    M = poplib.POP3_SSL(host, port, timeout=10, context=_NOVERIFY_CTX)
                 else:
                     M = poplib.POP3(host, port, timeout=10)
                 M.user(email)
@@ -454,7 +799,7 @@ class SettingsDialog(tk.Toplevel):
                 host = self.imap_host.get().strip()
                 port = int(self.imap_port.get().strip())
                 if self.imap_ssl.get():
-                    M = imaplib.IMAP4_SSL(host, port)
+                    M = imaplib.IMAP4_SSL(host, port, ssl_context=_NOVERIFY_CTX)
                 else:
                     M = imaplib.IMAP4(host, port)
                 M.socket().settimeout(10)
@@ -474,6 +819,7 @@ class SettingsDialog(tk.Toplevel):
                     password=self.msgtool_pass.get().strip()
                 )
                 resp = mc.inbox()
+                mc.close()
                 unread = resp.get("unread", 0)
                 results.append(f"MsgTool ({self.msgtool_server.get().strip()}): OK ({unread} 封未讀)")
             except Exception as e:
@@ -638,13 +984,7 @@ class ComposeDialog(tk.Toplevel):
                 msg = MIMEMultipart()
                 msg.attach(MIMEText(body, "plain", "utf-8"))
                 for path in self.attachments:
-                    with open(path, "rb") as f:
-                        data = f.read()
-                    part = MIMEBase("application", "octet-stream")
-                    part.set_payload(data)
-                    encoders.encode_base64(part)
-                    part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
-                    msg.attach(part)
+                    msg.attach(_attachment_part(path))
             else:
                 msg = MIMEText(body, "plain", "utf-8")
 
@@ -657,17 +997,15 @@ class ComposeDialog(tk.Toplevel):
 
             smtp_cfg = cfg["smtp"]
             use_starttls = smtp_cfg.get("starttls", False)
+            ctx = _SMTP_CTX if smtp_cfg.get("verify_ssl") else _NOVERIFY_CTX
 
             if use_starttls:
-                ctx = ssl.create_default_context()
-                ctx.check_hostname = False
-                ctx.verify_mode = ssl.CERT_NONE
                 s = smtplib.SMTP(smtp_cfg["host"], smtp_cfg["port"])
                 s.ehlo()
                 s.starttls(context=ctx)
                 s.ehlo()
             else:
-                s = smtplib.SMTP_SSL(smtp_cfg["host"], smtp_cfg["port"])
+                s = smtplib.SMTP_SSL(smtp_cfg["host"], smtp_cfg["port"], context=ctx)
 
             with s:
                 s.login(cfg["email"], str(cfg["password"]))
@@ -696,11 +1034,25 @@ class MailGUI:
         self.root.geometry("1000x700")
         self.config = MailConfig()
         self.mail_cache = MailCache()
-        self.messages = []  # list of (uid, flags, from_str, subject, date_str)
-        self._msg_cache = {}  # uid → (parsed_msg, raw) in-memory
+        self.messages = []  # list of CachedMsg
+        self._msg_cache = {}  # uid → parsed message; raw bytes stay in SQLite
         self._selected_idx = -1  # currently selected index in self.messages
+        self._filtered_indices = []  # Treeview row -> self.messages index, built by _update_list
+        self._list_rows = 0  # rows of self.messages inserted into the tree so far
+        self._list_gen = 0  # bumped per rebuild so stale insert chunks stop
+        self._search_after = None  # pending debounced search redraw
         self.current_folder = "INBOX"
 
+        # Pooled IMAP connection shared by fetch/delete, see _with_imap
+        self._imap = None
+        self._imap_key = None
+        self._imap_last_used = 0.0
+        self._imap_lock = threading.Lock()
+
+        # IMAP IDLE watcher (second connection), see _idle_thread
+        self._idle_stop = None
+        self._idle_folder = None
+
         # MsgTool state
         self.msgtool_client = None
         self.msgtool_messages = []
@@ -959,13 +1311,17 @@ class MailGUI:
             from msgtool_client import MsgClient
         except ImportError:
             return
-        self.msgtool_client = MsgClient(server_url=server, user=user, password=password)
+        if self.msgtool_client:
+            self.msgtool_client.close()  # drop the old kept-alive connection
+        client = self.msgtool_client = MsgClient(server_url=server, user=user, password=password)
         def test():
-            result = self.msgtool_client.notify()
+            result = client.notify()
             if "error" in result:
                 self.root.after(0, lambda: self._msgtool_set_status(
                     f"連線失敗: {result['error']}"))
-                self.msgtool_client = None
+                client.close()
+                if self.msgtool_client is client:
+                    self.msgtool_client = None
             else:
                 self.root.after(0, self._msgtool_connected)
         threading.Thread(target=test, daemon=True).start()
@@ -1103,6 +1459,15 @@ class MailGUI:
 
     def _on_close(self):
         self.msgtool_polling = False
+        if self.msgtool_client:
+            self.msgtool_client.close()
+        self._stop_idle()
+        # A worker mid-command owns the connection; skip the polite LOGOUT then
+        if self._imap_lock.acquire(blocking=False):
+            try:
+                self._close_imap()
+            finally:
+                self._imap_lock.release()
         self.mail_cache.close()
         self.root.destroy()
 
@@ -1117,18 +1482,26 @@ class MailGUI:
         ComposeDialog(self.root, self.config)
 
     def reply(self):
-        if self._selected_idx < 0:
-            return
-        msg, _ = self._get_parsed_msg(self._selected_idx)
-        if msg:
-            ComposeDialog(self.root, self.config, reply_to=msg)
+        self._start_reply(reply_all=False)
 
     def reply_all(self):
+        self._start_reply(reply_all=True)
+
+    def _start_reply(self, reply_all):
         if self._selected_idx < 0:
             return
-        msg, _ = self._get_parsed_msg(self._selected_idx)
-        if msg:
-            ComposeDialog(self.root, self.config, reply_to=msg, reply_all=True)
+        idx = self._selected_idx
+
+        def load():
+            # An uncached IMAP body is downloaded here, off the Tk thread
+            msg = self._get_parsed_msg(idx)
+            if msg:
+                self.root.after(0, lambda: ComposeDialog(
+                    self.root, self.config, reply_to=msg, reply_all=reply_all))
+            else:
+                self.root.after(0, lambda: messagebox.showerror("回覆失敗", "無法下載信件內容，請稍後再試"))
+
+        threading.Thread(target=load, daemon=True).start()
 
     def delete_mail(self):
         if self._selected_idx < 0:
@@ -1136,7 +1509,7 @@ class MailGUI:
         if not messagebox.askyesno("確認", "確定要刪除這封郵件嗎？"):
             return
         idx = self._selected_idx
-        uid = self.messages[idx][0]
+        uid = self.messages[idx].uid
         threading.Thread(target=self._delete_thread, args=(uid,), daemon=True).start()
 
     def _delete_thread(self, uid):
@@ -1148,7 +1521,7 @@ class MailGUI:
                 host = pop3_cfg.get("host", "webmail.hurricanesoft.com.tw")
                 port = pop3_cfg.get("port", 995)
                 if pop3_cfg.get("ssl", True):
-                    M = poplib.POP3_SSL(host, port)
+                    M = poplib.POP3_SSL(host, port, context=_NOVERIFY_CTX)
                 else:
                     M = poplib.POP3(host, port)
                 M.user(cfg["email"])
@@ -1156,16 +1529,12 @@ class MailGUI:
                 M.dele(int(uid))
                 M.quit()
             else:
-                imap_cfg = cfg["imap"]
-                if imap_cfg.get("ssl", True):
-                    M = imaplib.IMAP4_SSL(imap_cfg["host"], imap_cfg["port"])
-                else:
-                    M = imaplib.IMAP4(imap_cfg["host"], imap_cfg["port"])
-                M.login(cfg["email"], str(cfg["password"]))
-                M.select(self.current_folder)
-                M.uid("STORE", uid, "+FLAGS", "(\\Deleted)")
-                M.expunge()
-                M.logout()
+                folder = self.current_folder
+                def delete(M):
+                    M.select(folder)
+                    M.uid("STORE", uid, "+FLAGS", "(\\Deleted)")
+                    M.expunge()
+                self._with_imap(cfg, delete)
             # Remove from cache
             self.mail_cache.delete(cfg["email"], self.current_folder, uid)
             self._msg_cache.pop(uid, None)
@@ -1211,6 +1580,7 @@ class MailGUI:
         self.status_var.set(f"✓ 已載入 {len(self.messages)} 封郵件")
         self.root.config(cursor="")
         self._set_buttons_state("normal")
+        self._start_idle()
 
     def _fetch_pop3(self, cfg):
         pop3_cfg = cfg.get("pop3", {})
@@ -1221,7 +1591,7 @@ class MailGUI:
         folder = "INBOX"
 
         if use_ssl:
-            M = poplib.POP3_SSL(host, port)
+            M = poplib.POP3_SSL(host, port, context=_NOVERIFY_CTX)
         else:
             M = poplib.POP3(host, port)
 
@@ -1254,12 +1624,12 @@ class MailGUI:
                 self.root.after(0, lambda n=new_count: self.status_var.set(f"📨 下載第 {n+1} 封新郵件..."))
                 resp, lines, octets = M.retr(i)
                 raw = b"\r\n".join(lines)
-                msg = email.message_from_bytes(raw)
+                # Only the list columns are needed now; the body is parsed on open
+                msg = _HEADER_PARSER.parsebytes(raw)
                 from_str = _decode_header(msg.get("From", ""))
                 subject = _decode_header(msg.get("Subject", ""))
                 date_str = msg.get("Date", "")
                 new_messages.append((uid, "", from_str, subject, date_str, raw))
-                self._msg_cache[uid] = (msg, raw)
                 new_count += 1
             except Exception:
                 continue
@@ -1270,41 +1640,43 @@ class MailGUI:
             self.mail_cache.store_batch(account, folder, new_messages)
 
         # Reload full list from cache
-        rows = self.mail_cache.load_list(account, folder)
-        self.messages = list(rows)
-        self.root.after(0, self._update_list)
+        messages = self.mail_cache.load_list(account, folder, _cached_msg_row)
+        self.root.after(0, lambda: self._set_messages(messages))
 
     def _fetch_imap(self, cfg):
-        import re
-        imap_cfg = cfg["imap"]
         account = cfg["email"]
-        folder = self.current_folder
+        requested = self.current_folder
+        folder = self._with_imap(cfg, lambda M: self._sync_imap_folder(M, account, requested))
 
-        if imap_cfg.get("ssl", True):
-            M = imaplib.IMAP4_SSL(imap_cfg["host"], imap_cfg["port"])
-        else:
-            M = imaplib.IMAP4(imap_cfg["host"], imap_cfg["port"])
-        M.login(cfg["email"], str(cfg["password"]))
+        # Reload full list from cache
+        messages = self.mail_cache.load_list(account, folder, _cached_msg_row)
+        self.root.after(0, lambda: self._set_messages(messages))
 
+    def _sync_imap_folder(self, M, account, folder):
+        """Download messages missing from the cache; returns the folder actually selected."""
         status, _ = M.select(folder, readonly=True)
         if status != "OK":
             M.select("INBOX", readonly=True)
             folder = "INBOX"
 
-        # Get all UIDs from server
-        _, data = M.uid("SEARCH", None, "ALL")
-        server_uids = data[0].split() if data[0] else []
         fetch_limit = 50
-        server_uids = server_uids[-fetch_limit:]
-
-        # Find which UIDs we don't have cached
-        cached_uids = self.mail_cache.get_uids(account, folder)
-        new_uids = [u for u in server_uids if u.decode() not in cached_uids]
+        max_uid = self.mail_cache.max_uid(account, folder)
+        if max_uid:
+            # Only ask the server for UIDs newer than the newest cached one
+            _, data = M.uid("SEARCH", None, f"UID {max_uid + 1}:*")
+            # "n:*" always matches the highest UID, even when it is below n
+            new_uids = [u for u in (data[0].split() if data[0] else []) if int(u) > max_uid]
+        else:
+            # Empty cache: backfill the newest messages
+            _, data = M.uid("SEARCH", None, "ALL")
+            new_uids = data[0].split() if data[0] else []
+        new_uids = new_uids[-fetch_limit:]
 
         if new_uids:
             self.root.after(0, lambda: self.status_var.set(f"📨 下載 {len(new_uids)} 封新郵件..."))
             uid_str = b",".join(new_uids)
-            _, fetch_data = M.uid("FETCH", uid_str, "(FLAGS BODY.PEEK[])")
+            # List view needs only these headers; bodies are fetched on selection
+            _, fetch_data = M.uid("FETCH", uid_str, "(UID FLAGS BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE CC)])")
 
             new_messages = []
             i = 0
@@ -1312,33 +1684,141 @@ class MailGUI:
                 item = fetch_data[i]
                 if isinstance(item, tuple) and len(item) == 2:
                     resp_line = item[0]
-                    raw = item[1]
-                    resp_str = resp_line.decode("utf-8", errors="replace") if isinstance(resp_line, bytes) else str(resp_line)
-                    uid_val = ""
-                    flags = ""
-                    uid_match = re.search(r"UID (\d+)", resp_str)
-                    if uid_match:
-                        uid_val = uid_match.group(1)
-                    flag_match = re.search(r"FLAGS \(([^)]*)\)", resp_str)
-                    if flag_match:
-                        flags = flag_match.group(1)
-                    msg = email.message_from_bytes(raw)
+                    header_bytes = item[1]
+                    uid_match = _UID_RE.search(resp_line)
+                    uid_val = uid_match.group(1).decode() if uid_match else ""
+                    flag_match = _FLAGS_RE.search(resp_line)
+                    flags = flag_match.group(1).decode("utf-8", errors="replace") if flag_match else ""
+                    msg = _HEADER_PARSER.parsebytes(header_bytes)
                     from_str = _decode_header(msg.get("From", ""))
                     subject = _decode_header(msg.get("Subject", ""))
                     date_str = msg.get("Date", "")
-                    new_messages.append((uid_val, flags, from_str, subject, date_str, raw))
-                    self._msg_cache[uid_val] = (msg, raw)
+                    new_messages.append((uid_val, flags, from_str, subject, date_str, None))
                 i += 1
 
             if new_messages:
                 self.mail_cache.store_batch(account, folder, new_messages)
 
-        M.logout()
+        return folder
 
-        # Reload full list from cache
-        rows = self.mail_cache.load_list(account, folder)
-        self.messages = list(rows)
-        self.root.after(0, self._update_list)
+    # --- Pooled IMAP connection ---
+
+    def _imap_connect(self, cfg):
+        imap_cfg = cfg["imap"]
+        if imap_cfg.get("ssl", True):
+            M = imaplib.IMAP4_SSL(imap_cfg["host"], imap_cfg["port"], ssl_context=_NOVERIFY_CTX)
+        else:
+            M = imaplib.IMAP4(imap_cfg["host"], imap_cfg["port"])
+        M.login(cfg["email"], str(cfg["password"]))
+        return M
+
+    def _get_imap(self, cfg):
+        """Return the pooled IMAP connection, connecting on first use. Caller holds _imap_lock."""
+        imap_cfg = cfg["imap"]
+        key = (imap_cfg["host"], imap_cfg["port"], imap_cfg.get("ssl", True),
+               cfg["email"], str(cfg["password"]))
+        if self._imap is not None and self._imap_key != key:
+            # Account settings changed since the connection was opened
+            self._close_imap()
+        if self._imap is not None and time.monotonic() - self._imap_last_used > 60:
+            # Idle connections may have been dropped server-side; probe before reuse
+            try:
+                self._imap.noop()
+            except (imaplib.IMAP4.error, OSError):
+                self._close_imap()
+        if self._imap is None:
+            self._imap = self._imap_connect(cfg)
+            self._imap_key = key
+        return self._imap
+
+    def _close_imap(self):
+        """Log out the pooled IMAP connection. Caller holds _imap_lock."""
+        M, self._imap = self._imap, None
+        if M is not None:
+            try:
+                M.logout()
+            except Exception:
+                pass
+
+    # --- IMAP IDLE push notification ---
+
+    def _start_idle(self):
+        """Watch the current IMAP folder with IDLE so new mail is synced without polling."""
+        if self.config.data.get("recv_protocol", "imap") == "pop3":
+            self._stop_idle()
+            return
+        if self._idle_stop is not None and not self._idle_stop.is_set() \
+                and self._idle_folder == self.current_folder:
+            return  # already watching this folder
+        self._stop_idle()
+        self._idle_stop = threading.Event()
+        self._idle_folder = self.current_folder
+        threading.Thread(target=self._idle_thread,
+                         args=(self.config.data, self.current_folder, self._idle_stop),
+                         daemon=True).start()
+
+    def _stop_idle(self):
+        if self._idle_stop is not None:
+            self._idle_stop.set()
+            self._idle_stop = None
+
+    def _idle_thread(self, cfg, folder, stop):
+        """Hold a dedicated connection in IDLE and trigger a sync on EXISTS."""
+        M = None
+        try:
+            M = self._imap_connect(cfg)
+            if "IDLE" not in M.capabilities:
+                return
+            M.select(folder, readonly=True)
+            # From here on talk to the socket directly so reads can time out
+            # and notice `stop` without corrupting imaplib's buffered reader
+            sock = M.socket()
+            sock.settimeout(1.0)
+            lines = _idle_lines(sock, stop)
+            while not stop.is_set():
+                tag = M._new_tag()
+                sock.sendall(tag + b" IDLE\r\n")
+                deadline = time.monotonic() + _IDLE_RESTART
+                new_mail = False
+                for line in lines:
+                    if line is None:
+                        if time.monotonic() >= deadline:
+                            break
+                    elif line.startswith(tag):
+                        return  # server refused IDLE
+                    elif line.endswith(b" EXISTS"):
+                        new_mail = True
+                        break
+                else:
+                    return  # stopped
+                sock.sendall(b"DONE\r\n")
+                for line in lines:
+                    if line is not None and line.startswith(tag):
+                        break
+                else:
+                    return
+                if new_mail:
+                    self.root.after(0, self.fetch_mail)
+        except Exception:
+            pass  # best effort: manual 收信 still works
+        finally:
+            stop.set()
+            if M is not None:
+                try:
+                    M.shutdown()
+                except Exception:
+                    pass
+
+    def _with_imap(self, cfg, func):
+        """Run func(M) on the pooled IMAP connection, reconnecting once if it was dropped."""
+        with self._imap_lock:
+            try:
+                result = func(self._get_imap(cfg))
+            except (imaplib.IMAP4.abort, OSError):
+                self._close_imap()
+                result = func(self._get_imap(cfg))
+            self._imap_last_used = time.monotonic()
+            return result
 
     def _fetch_error(self, err):
         self.status_var.set("✗ 收信失敗")
@@ -1346,54 +1826,121 @@ class MailGUI:
         self._set_buttons_state("normal")
         messagebox.showerror("收信錯誤", f"無法連線：{err}")
 
+    def _set_messages(self, messages):
+        # Swapped in on the Tk thread so the tree rows always match self.messages
+        self.messages = messages
+        self._update_list()
+
     def _update_list(self):
-        self.tree.delete(*self.tree.get_children())
+        """Recreate the tree rows after self.messages changed.
+
+        Rows go in _LIST_CHUNK at a time from Tk idle callbacks so a large
+        folder never blocks the event loop; a newer rebuild cancels the rest.
+        """
+        self._list_gen += 1
+        # Detached (filtered out) rows are not children, so delete by iid
+        self.tree.delete(*(str(i) for i in range(self._list_rows)))
+        self._list_rows = 0
+        self._filtered_indices = []
+        self._insert_rows(self._list_gen)
+        # Set once, up front, so a caller's status set right after this stays
+        # visible while the remaining chunks are inserted
         search = self.search_var.get().lower()
-        count = 0
-        for uid, flags, from_str, subject, date_str in self.messages:
-            if search and search not in from_str.lower() and search not in subject.lower():
-                continue
-            status = "●" if "\\Seen" not in flags else "○"
-            self.tree.insert("", "end", values=(status, from_str[:40], subject[:80], date_str[:25]))
-            count += 1
-        self.status_var.set(f"共 {count} 封郵件 ({self.current_folder})")
+        shown = (sum(1 for m in self.messages if search in m.from_lower or search in m.subject_lower)
+                 if search else len(self.messages))
+        self.status_var.set(f"共 {shown} 封郵件 ({self.current_folder})")
 
-    def _on_search(self, *args):
-        if self.messages:
-            self._update_list()
+    def _insert_rows(self, gen):
+        if gen != self._list_gen:
+            return
+        search = self.search_var.get().lower()
+        end = min(self._list_rows + _LIST_CHUNK, len(self.messages))
+        for i in range(self._list_rows, end):
+            m = self.messages[i]
+            status = "●" if "\\Seen" not in m.flags else "○"
+            iid = str(i)
+            self.tree.insert("", "end", iid=iid,
+                             values=(status, m.display_from, m.display_subject, m.display_date))
+            if search and search not in m.from_lower and search not in m.subject_lower:
+                self.tree.detach(iid)
+            else:
+                self._filtered_indices.append(i)
+        self._list_rows = end
+        if end < len(self.messages):
+            self.root.after_idle(lambda: self._insert_rows(gen))
 
-    def _map_display_to_actual(self, display_idx):
-        """Map Treeview display index to self.messages index (accounting for search)."""
+    def _apply_filter(self):
+        """Show rows matching the search by detaching/reattaching existing items."""
         search = self.search_var.get().lower()
-        count = 0
-        for i, (uid, flags, from_str, subject, date_str) in enumerate(self.messages):
-            if search and search not in from_str.lower() and search not in subject.lower():
-                continue
-            if count == display_idx:
-                return i
-            count += 1
-        return -1
+        # Only rows already inserted; later chunks filter themselves
+        rows = range(self._list_rows)
+        if search:
+            msgs = self.messages
+            matched = [i for i in rows
+                       if search in msgs[i].from_lower or search in msgs[i].subject_lower]
+        else:
+            matched = list(rows)
+        # Same rows as shown already (empty query after a rebuild, or a longer
+        # query that still matches the same mails): leave the tree alone
+        if matched != self._filtered_indices:
+            self.tree.detach(*self.tree.get_children())
+            for pos, i in enumerate(matched):
+                self.tree.move(str(i), "", pos)
+            self._filtered_indices = matched
+        self.status_var.set(f"共 {len(self._filtered_indices)} 封郵件 ({self.current_folder})")
+
+    def _on_search(self, *args):
+        # Debounce: redraw once typing pauses instead of on every keystroke
+        if self._search_after:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(150, self._run_search)
+
+    def _run_search(self):
+        self._search_after = None
+        if self.messages:
+            self._apply_filter()
 
     def _get_parsed_msg(self, idx):
         """Get parsed email message from memory cache or SQLite."""
-        uid = self.messages[idx][0]
+        uid = self.messages[idx].uid
         if uid in self._msg_cache:
             return self._msg_cache[uid]
-        raw = self.mail_cache.load_raw(self.config.get("email"), self.current_folder, uid)
+        account = self.config.get("email")
+        folder = self.current_folder
+        raw = self.mail_cache.load_raw(account, folder, uid)
+        if raw is None and self.config.data.get("recv_protocol", "imap") != "pop3":
+            # IMAP lists are fetched header-only; download the body on first open
+            raw = self._fetch_imap_body(folder, uid)
+            if raw:
+                self.mail_cache.store_raw(account, folder, uid, raw)
         if raw:
-            msg = email.message_from_bytes(raw)
-            self._msg_cache[uid] = (msg, raw)
-            return msg, raw
-        return None, None
+            msg = _PARSER.parsebytes(raw)
+            self._msg_cache[uid] = msg
+            return msg
+        return None
+
+    def _fetch_imap_body(self, folder, uid):
+        """Download one full message over the pooled IMAP connection."""
+        def fetch(M):
+            M.select(folder, readonly=True)
+            _, data = M.uid("FETCH", uid, "(BODY.PEEK[])")
+            for item in data:
+                if isinstance(item, tuple) and len(item) == 2:
+                    return item[1]
+            return None
+        try:
+            return self._with_imap(self.config.data, fetch)
+        except Exception:
+            return None
 
     def _on_select(self, event):
         sel = self.tree.selection()
         if not sel:
             return
         display_idx = self.tree.index(sel[0])
-        actual_idx = self._map_display_to_actual(display_idx)
-        if actual_idx < 0:
+        if display_idx >= len(self._filtered_indices):
             return
+        actual_idx = self._filtered_indices[display_idx]
 
         self._selected_idx = actual_idx
 
@@ -1410,18 +1957,18 @@ class MailGUI:
         threading.Thread(target=self._load_message, args=(actual_idx,), daemon=True).start()
 
     def _load_message(self, idx):
-        uid, flags, from_str, subject, date_str = self.messages[idx]
-        msg, raw = self._get_parsed_msg(idx)
+        m = self.messages[idx]
+        msg = self._get_parsed_msg(idx)
         if msg:
             text_body, html_body = _get_body(msg)
             attachments = _get_attachments(msg)
             display = text_body or html_body or "(無內容)"
         else:
-            display = "(信件內容未快取，請重新收信)"
+            display = "(信件內容下載失敗，請稍後再試)"
             attachments = []
 
         self.root.after(0, lambda: self._show_message(
-            from_str, subject, date_str, display, attachments)
+            m.from_str, m.subject, m.date_str, display, attachments)
         )
 
     def _show_message(self, from_str, subject, date_str, display, attachments):
@@ -1445,10 +1992,16 @@ class MailGUI:
         folder = filedialog.askdirectory(title="選擇附件儲存目錄")
         if not folder:
             return
-        for att in attachments:
-            path = os.path.join(folder, att["filename"])
+
+        def write(att, path):
             with open(path, "wb") as f:
-                f.write(att["data"])
+                f.write(_attachment_data(att))
+
+        # Distinct target per attachment, or two workers would write one file
+        paths = _attachment_paths(folder, [att["filename"] for att in attachments])
+        # Overlap file creation/writes; list() re-raises the first write error
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(8, len(attachments)))) as pool:
+            list(pool.map(write, attachments, paths))
         messagebox.showinfo("附件", f"已儲存 {len(attachments)} 個附件！")
 
     def run(self):
@@ -1464,10 +2017,9 @@ class MailGUI:
         """Load email list from SQLite cache for instant display."""
         account = self.config.get("email")
         folder = self.current_folder
-        rows = self.mail_cache.load_list(account, folder)
-        if rows:
-            self.messages = list(rows)
-            self._update_list()
+        messages = self.mail_cache.load_list(account, folder, _cached_msg_row)
+        if messages:
+            self._set_messages(messages)
             self.status_var.set(f"✓ 快取載入 {len(self.messages)} 封郵件（同步中...）")
 
 
@@ -1479,56 +2031,61 @@ def cli_send(args, config):
         print("Error: Email and password not configured. Run GUI mode to configure.")
         sys.exit(1)
 
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = f"{cfg.get('name', '')} <{cfg['email']}>"
-    msg['To'] = args.to
-    msg['Subject'] = args.subject
+    from_hdr = f"{cfg.get('name', '')} <{cfg['email']}>"
 
-    if args.cc:
-        msg['Cc'] = args.cc
+    # Parse CC once; getaddresses copes with quoted display names containing commas
+    cc_addrs = tuple(addr for _, addr in email.utils.getaddresses([args.cc]) if addr) if args.cc else ()
+    cc = args.cc if cc_addrs else None
 
     # Add body
-    body = args.body
+    body = args.body or ""
     if args.file:
         with open(args.file, 'r', encoding='utf-8') as f:
             body = f.read()
 
-    msg.attach(MIMEText(body, 'plain'))
+    # Plain text without attachments is serialized directly, skipping email.mime
+    raw = None if args.attach else _build_plain_message(from_hdr, args.to, args.subject, body, cc)
+
+    def build_mime():
+        msg = MIMEMultipart()
+        msg['From'] = from_hdr
+        msg['To'] = args.to
+        msg['Subject'] = args.subject
+        if cc:
+            msg['Cc'] = cc
 
-    # Add attachments
-    if args.attach:
-        for filepath in args.attach:
-            if os.path.exists(filepath):
-                with open(filepath, 'rb') as f:
-                    part = MIMEBase('application', 'octet-stream')
-                    part.set_payload(f.read())
-                    encoders.encode_base64(part)
-                    part.add_header('Content-Disposition', f'attachment; filename={os.path.basename(filepath)}')
-                    msg.attach(part)
+        msg.attach(MIMEText(body, 'plain'))
+
+        # Add attachments
+        if args.attach:
+            for filepath in args.attach:
+                if os.path.exists(filepath):
+                    msg.attach(_attachment_part(filepath))
+        return msg
 
     # Send email
     try:
         smtp_cfg = cfg["smtp"]
         use_starttls = smtp_cfg.get("starttls", False)
+        ctx = _SMTP_CTX if smtp_cfg.get("verify_ssl") else _NOVERIFY_CTX
 
         if use_starttls:
-            ctx = ssl.create_default_context()
-            ctx.check_hostname = False
-            ctx.verify_mode = ssl.CERT_NONE
             s = smtplib.SMTP(smtp_cfg["host"], smtp_cfg["port"])
             s.ehlo()
             s.starttls(context=ctx)
             s.ehlo()
         else:
-            s = smtplib.SMTP_SSL(smtp_cfg["host"], smtp_cfg["port"])
+            s = smtplib.SMTP_SSL(smtp_cfg["host"], smtp_cfg["port"], context=ctx)
 
         with s:
             s.login(cfg["email"], str(cfg["password"]))
-            recipients = [args.to]
-            if args.cc:
-                recipients.extend([a.strip() for a in args.cc.split(",")])
-            s.send_message(msg, to_addrs=recipients)
+            recipients = (args.to, *cc_addrs)
+            if raw is not None and body.isascii():
+                s.sendmail(cfg["email"], recipients, raw)
+            elif raw is not None and s.has_extn("8bitmime"):
+                s.sendmail(cfg["email"], recipients, raw, mail_options=("BODY=8BITMIME",))
+            else:
+                s.send_message(build_mime(), to_addrs=recipients)
 
         print(f"✓ Email sent successfully to {args.to}")
     except Exception as e:
@@ -1549,7 +2106,7 @@ def cli_receive(args, config):
     try:
         if protocol == "imap":
             imap_cfg = cfg["imap"]
-            M = imaplib.IMAP4_SSL(imap_cfg["host"], imap_cfg["port"])
+            M = imaplib.IMAP4_SSL(imap_cfg["host"], imap_cfg["port"], ssl_context=_NOVERIFY_CTX)
             M.login(cfg["email"], str(cfg["password"]))
             M.select("INBOX")
 
@@ -1561,9 +2118,9 @@ def cli_receive(args, config):
 
             for i in range(1, count + 1):
                 mail_id = mail_ids[-i]
-                _, msg_data = M.fetch(mail_id, "(RFC822)")
-                raw_email = msg_data[0][1]
-                msg = email.message_from_bytes(raw_email)
+                # Only the listed headers are printed, so skip downloading the body
+                _, msg_data = M.fetch(mail_id, "(BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE)])")
+                msg = _HEADER_PARSER.parsebytes(msg_data[0][1])
 
                 from_addr = parseaddr(msg.get("From", ""))[1]
                 subject = _decode_header(msg.get("Subject", "(無主旨)"))
@@ -1578,7 +2135,7 @@ def cli_receive(args, config):
             M.logout()
         else:  # POP3
             pop3_cfg = cfg["pop3"]
-            M = poplib.POP3_SSL(pop3_cfg["host"], pop3_cfg["port"])
+            M = poplib.POP3_SSL(pop3_cfg["host"], pop3_cfg["port"], context=_NOVERIFY_CTX)
             M.user(cfg["email"])
             M.pass_(str(cfg["password"]))
 
@@ -1588,9 +2145,13 @@ def cli_receive(args, config):
             print(f"\n📬 Fetching {count} emails...\n")
 
             for i in range(1, count + 1):
-                _, lines, _ = M.retr(num_messages - i + 1)
-                raw_email = b"\r\n".join(lines)
-                msg = email.message_from_bytes(raw_email)
+                which = num_messages - i + 1
+                try:
+                    # TOP n 0 returns only the header block
+                    _, lines, _ = M.top(which, 0)
+                except poplib.error_proto:
+                    _, lines, _ = M.retr(which)
+                msg = _HEADER_PARSER.parsebytes(b"\r\n".join(lines))
 
                 from_addr = parseaddr(msg.get("From", ""))[1]
                 subject = _decode_header(msg.get("Subject", "(無主旨)"))
@@ -1697,16 +2258,16 @@ def cli_setup(args, config):
     print(f"🔐 Password encrypted and saved securely")
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description='MailGUI - Hurricane Software Mail Client',
-        epilog='Run without arguments to launch GUI mode'
-    )
+def cli_config(args, config):
+    """Show configuration file location"""
+    print(f"Configuration file: {CONFIG_FILE}")
+    print(f"Exists: {os.path.exists(CONFIG_FILE)}")
+    if os.path.exists(CONFIG_FILE):
+        print(f"Encryption key: {KEY_FILE}")
+        print(f"Password encrypted: Yes")
 
-    subparsers = parser.add_subparsers(dest='command', help='Available commands')
 
-    # Send command
-    send_parser = subparsers.add_parser('send', help='Send an email')
+def _add_send_args(send_parser):
     send_parser.add_argument('--to', required=True, help='Recipient email address')
     send_parser.add_argument('--subject', required=True, help='Email subject')
     send_parser.add_argument('--body', help='Email body text')
@@ -1714,12 +2275,12 @@ def main():
     send_parser.add_argument('--cc', help='CC recipients (comma-separated)')
     send_parser.add_argument('--attach', nargs='+', help='Attachment file paths')
 
-    # Receive command
-    recv_parser = subparsers.add_parser('receive', help='Receive emails')
+
+def _add_receive_args(recv_parser):
     recv_parser.add_argument('--count', type=int, default=10, help='Number of emails to fetch (default: 10)')
 
-    # Setup command
-    setup_parser = subparsers.add_parser('setup', help='Configure email account (interactive)')
+
+def _add_setup_args(setup_parser):
     setup_parser.add_argument('--email', help='Email address')
     setup_parser.add_argument('--name', help='Display name')
     setup_parser.add_argument('--password', help='Password (insecure - prompt recommended)')
@@ -1731,26 +2292,60 @@ def main():
     setup_parser.add_argument('--pop3-port', type=int, help='POP3 port')
     setup_parser.add_argument('--protocol', choices=['imap', 'pop3'], help='Receive protocol')
 
-    # Config command
-    config_parser = subparsers.add_parser('config', help='Show configuration file location')
 
-    args = parser.parse_args()
+# command -> (handler, help, argument builder)
+_CLI_COMMANDS = {
+    'send': (cli_send, 'Send an email', _add_send_args),
+    'receive': (cli_receive, 'Receive emails', _add_receive_args),
+    'setup': (cli_setup, 'Configure email account (interactive)', _add_setup_args),
+    'config': (cli_config, 'Show configuration file location', None),
+}
+
+
+def _build_parser(only=None):
+    """Build the CLI parser; with `only`, just that one subcommand is registered."""
+    parser = argparse.ArgumentParser(
+        description='MailGUI - Hurricane Software Mail Client',
+        epilog='Run without arguments to launch GUI mode'
+    )
+    subparsers = parser.add_subparsers(dest='command', help='Available commands')
+    for name, (_, help_text, add_args) in _CLI_COMMANDS.items():
+        if only is None or name == only:
+            sub = subparsers.add_parser(name, help=help_text)
+            if add_args:
+                add_args(sub)
+    return parser
+
+
+def main():
+    argv = sys.argv[1:]
+
+    # Fernet relies on OpenSSL's AES; flag VMs that hide AES-NI from the guest
+    if _aes_ni_available() is False:
+        print("Warning: AES-NI not detected, password encryption falls back to software AES",
+              file=sys.stderr)
+
+    # No arguments = GUI mode; don't pay for building the CLI parser
+    if not argv:
+        app = MailGUI()
+        app.run()
+        return
+
+    # `config` takes no options, so dispatch it without argparse at all
+    if argv == ['config']:
+        cli_config(None, MailConfig())
+        return
+
+    # Known subcommand: register only that subparser; otherwise build the
+    # full parser so help and error messages list every command
+    command = argv[0] if argv[0] in _CLI_COMMANDS else None
+    args = _build_parser(command).parse_args(argv)
 
     # Load config
     config = MailConfig()
 
-    if args.command == 'send':
-        cli_send(args, config)
-    elif args.command == 'receive':
-        cli_receive(args, config)
-    elif args.command == 'setup':
-        cli_setup(args, config)
-    elif args.command == 'config':
-        print(f"Configuration file: {CONFIG_FILE}")
-        print(f"Exists: {os.path.exists(CONFIG_FILE)}")
-        if os.path.exists(CONFIG_FILE):
-            print(f"Encryption key: {KEY_FILE}")
-            print(f"Password encrypted: Yes")
+    if args.command in _CLI_COMMANDS:
+        _CLI_COMMANDS[args.command][0](args, config)
     else:
         # No command = GUI mode
         app = MailGUI()
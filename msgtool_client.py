@@ -1,92 +1,240 @@
 """MsgTool HTTP Client — connects to MsgTool server."""
+from __future__ import annotations
+
+import asyncio
+import http.client
 import json
-import urllib.request
-import urllib.error
 import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urlencode, urlsplit
+
+# orjson (optional, `pip install mailgui[fast]`) parses/serializes in C
+_loads: Callable[[Any], Any]
+_dumps: Callable[[Any], bytes]
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode()
+
+
+# Idle kept-alive connections a client holds on to between requests
+_MAX_IDLE = 4
+
+# Seconds a successful GET result is reused, e.g. notify() from several timers
+_GET_TTL = 1.0
 
 
 class MsgClient:
-    def __init__(self, server_url=None, user=None, password=None):
-        self.server_url = (server_url or os.environ.get('MSGTOOL_SERVER', 
+    def __init__(self, server_url: Optional[str] = None, user: Optional[str] = None,
+                 password: Optional[str] = None) -> None:
+        self.server_url: str = (server_url or os.environ.get('MSGTOOL_SERVER', 
                            'http://localhost:8900')).rstrip('/')
-        self.user = user or os.environ.get('MSG_USER', '')
-        self.password = password or os.environ.get('MSG_PASSWORD', '')
-
-    def _headers(self):
-        return {
-            'X-User': self.user,
-            'X-Password': self.password,
-            'Content-Type': 'application/json',
-        }
-
-    def _get(self, path, params=None):
-        url = f"{self.server_url}{path}"
-        if params:
-            from urllib.parse import urlencode
-            url += '?' + urlencode(params)
-        req = urllib.request.Request(url, headers=self._headers())
-        try:
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                return json.loads(resp.read())
-        except urllib.error.HTTPError as e:
-            body = e.read().decode() if e.fp else ''
+        self.user: str = user or os.environ.get('MSG_USER', '')
+        self.password: str = password or os.environ.get('MSG_PASSWORD', '')
+        # Kept-alive connections, opened on demand; concurrent calls each get their own
+        parts = urlsplit(self.server_url)
+        self._conn_cls: type[http.client.HTTPConnection] = (http.client.HTTPSConnection if parts.scheme == 'https'
+                          else http.client.HTTPConnection)
+        self._netloc = parts.netloc
+        self._base_path = parts.path
+        self._idle: List[http.client.HTTPConnection] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        self._headers_creds: Optional[Tuple[str, str]] = None
+        self._cached_headers: Dict[str, str] = {}
+        # (user, path?query) -> (monotonic time, result)
+        self._get_cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+
+    def _headers(self) -> Dict[str, str]:
+        # Reused for every request; rebuilt only if the credentials are reassigned
+        creds = (self.user, self.password)
+        if self._headers_creds != creds:
+            self._headers_creds = creds
+            self._cached_headers = {
+                'X-User': self.user,
+                'X-Password': self.password,
+                'Content-Type': 'application/json',
+            }
+        return self._cached_headers
+
+    def close(self) -> None:
+        with self._lock:
+            # Requests still in flight close their connection in _release
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _acquire(self, fresh: bool = False) -> Tuple[http.client.HTTPConnection, bool]:
+        """Return (connection, reused): an idle pooled one, or a new one."""
+        if not fresh:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop(), True
+        return self._conn_cls(self._netloc, timeout=10), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < _MAX_IDLE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        """Send a request over a pooled connection, return (status, body bytes).
+
+        A reused connection the server has since dropped is discarded and the
+        request retried once on a new one.
+        """
+        for attempt in range(2):
+            conn, reused = self._acquire(fresh=attempt > 0)
             try:
-                return json.loads(body)
-            except:
-                return {'error': f'HTTP {e.code}: {body}'}
-        except Exception as e:
-            return {'error': str(e)}
+                conn.request(method, self._base_path + path, body=body,
+                             headers=self._headers())
+                resp = conn.getresponse()
+                data = resp.read()
+            except Exception as e:
+                conn.close()
+                stale = isinstance(e, (http.client.HTTPException, ConnectionError))
+                if not (reused and stale) or attempt:
+                    raise
+                continue
+            self._release(conn)
+            return resp.status, data
+        raise AssertionError('unreachable')  # second attempt returns or raises
 
-    def _post(self, path, data):
-        url = f"{self.server_url}{path}"
-        body = json.dumps(data).encode()
-        req = urllib.request.Request(url, data=body, headers=self._headers())
+    def _call(self, method: str, path: str, body: Optional[bytes] = None) -> Any:
         try:
-            with urllib.request.urlopen(req, timeout=10) as resp:
-                return json.loads(resp.read())
-        except urllib.error.HTTPError as e:
-            body = e.read().decode() if e.fp else ''
-            try:
-                return json.loads(body)
-            except:
-                return {'error': f'HTTP {e.code}: {body}'}
+            status, data = self._request(method, path, body)
+            if status >= 400:
+                text = data.decode()
+                try:
+                    return _loads(text)
+                except:
+                    return {'error': f'HTTP {status}: {text}'}
+            return _loads(data)
         except Exception as e:
             return {'error': str(e)}
 
-    def health(self):
+    def invalidate(self) -> None:
+        """Forget cached GET results, e.g. after a change on the server."""
+        with self._lock:
+            self._get_cache.clear()
+
+    def _get(self, path: str, params: Optional[Dict[str, str]] = None,
+             cache: bool = True) -> Any:
+        if params:
+            path += '?' + urlencode(params)
+        if not cache:
+            return self._call('GET', path)
+        key = (self.user, path)
+        with self._lock:
+            hit = self._get_cache.get(key)
+        if hit and time.monotonic() - hit[0] < _GET_TTL:
+            return hit[1]
+        result = self._call('GET', path)
+        if not (isinstance(result, dict) and 'error' in result):
+            with self._lock:
+                self._get_cache[key] = (time.monotonic(), result)
+        return result
+
+    def _post(self, path: str, data: Dict[str, Any]) -> Any:
+        result = self._call('POST', path, _dumps(data))
+        # Any POST changes server state (new message, read marks, users)
+        self.invalidate()
+        return result
+
+    def health(self) -> Any:
         return self._get('/health')
 
-    def inbox(self, unread=False, limit=50):
+    def inbox(self, unread: bool = False, limit: int = 50) -> Any:
         params = {'limit': str(limit)}
         if unread:
             params['unread'] = '1'
         return self._get('/inbox', params)
 
-    def sent(self, limit=50):
+    def sent(self, limit: int = 50) -> Any:
         return self._get('/sent', {'limit': str(limit)})
 
-    def read(self, msg_id):
-        return self._get(f'/read/{msg_id}')
+    def read(self, msg_id: Union[int, str]) -> Any:
+        # Reading marks the message read on the server, so it is never cached
+        # and drops cached listings that still show it unread
+        result = self._get(f'/read/{msg_id}', cache=False)
+        self.invalidate()
+        return result
 
-    def send(self, to, msg, reply_to=None):
-        data = {'to': to, 'msg': msg}
+    def send(self, to: str, msg: str, reply_to: Optional[str] = None) -> Any:
+        data: Dict[str, Any] = {'to': to, 'msg': msg}
         if reply_to:
             data['reply_to'] = reply_to
         return self._post('/send', data)
 
-    def reply(self, msg_id, msg):
+    def reply(self, msg_id: Union[int, str], msg: str) -> Any:
         return self._post('/reply', {'id': msg_id, 'msg': msg})
 
-    def mentions(self, limit=20):
+    def mentions(self, limit: int = 20) -> Any:
         return self._get('/mentions', {'limit': str(limit)})
 
-    def notify(self):
+    def notify(self) -> Any:
         return self._get('/notify')
 
-    def users(self):
+    def users(self) -> Any:
         return self._get('/users')
 
-    def register(self, username, password, display_name=''):
+    def register(self, username: str, password: str, display_name: str = '') -> Any:
         return self._post('/register', {
             'username': username, 'password': password, 'display_name': display_name
         })
+
+
+class AsyncMsgClient:
+    """asyncio front end to MsgClient.
+
+    Each call runs the blocking request in a worker thread on its own pooled
+    connection, so calls combined with asyncio.gather overlap on the network.
+    """
+
+    def __init__(self, server_url: Optional[str] = None, user: Optional[str] = None,
+                 password: Optional[str] = None) -> None:
+        self.client = MsgClient(server_url, user, password)
+
+    def close(self) -> None:
+        self.client.close()
+
+    async def health(self) -> Any:
+        return await asyncio.to_thread(self.client.health)
+
+    async def inbox(self, unread: bool = False, limit: int = 50) -> Any:
+        return await asyncio.to_thread(self.client.inbox, unread, limit)
+
+    async def sent(self, limit: int = 50) -> Any:
+        return await asyncio.to_thread(self.client.sent, limit)
+
+    async def read(self, msg_id: Union[int, str]) -> Any:
+        return await asyncio.to_thread(self.client.read, msg_id)
+
+    async def send(self, to: str, msg: str, reply_to: Optional[str] = None) -> Any:
+        return await asyncio.to_thread(self.client.send, to, msg, reply_to)
+
+    async def reply(self, msg_id: Union[int, str], msg: str) -> Any:
+        return await asyncio.to_thread(self.client.reply, msg_id, msg)
+
+    async def mentions(self, limit: int = 20) -> Any:
+        return await asyncio.to_thread(self.client.mentions, limit)
+
+    async def notify(self) -> Any:
+        return await asyncio.to_thread(self.client.notify)
+
+    async def users(self) -> Any:
+        return await asyncio.to_thread(self.client.users)
+
+    async def register(self, username: str, password: str, display_name: str = '') -> Any:
+        return await asyncio.to_thread(self.client.register, username, password, display_name)
@@ -2,6 +2,7 @@
 import os
 import tempfile
 import pytest
+from unittest.mock import Mock
 
 
 def _setup_env(tmp_path):
@@ -14,6 +15,15 @@ def _setup_env(tmp_path):
         os.remove(mailgui.KEY_FILE)
 
 
+@pytest.fixture(scope="module")
+def mailgui_env(tmp_path_factory):
+    """Isolated config/key environment with the key created once per module."""
+    import mailgui
+    _setup_env(tmp_path_factory.mktemp("crypto"))
+    mailgui._get_fernet()
+    return mailgui
+
+
 class TestGetOrCreateKey:
     def test_creates_key_file(self, tmp_path):
         _setup_env(tmp_path)
@@ -29,6 +39,14 @@ class TestGetOrCreateKey:
         key2 = mailgui._get_or_create_key()
         assert key1 == key2
 
+    def test_fernet_cached_per_key_file(self, tmp_path):
+        _setup_env(tmp_path)
+        import mailgui
+        f = mailgui._get_fernet()
+        assert mailgui._get_fernet() is f
+        _setup_env(tmp_path / "other")
+        assert mailgui._get_fernet() is not f
+
     def test_key_file_permissions(self, tmp_path):
         _setup_env(tmp_path)
         import mailgui
@@ -38,33 +56,29 @@ class TestGetOrCreateKey:
 
 
 class TestEncryptPassword:
-    def test_encrypt_decrypt_roundtrip(self, tmp_path):
-        _setup_env(tmp_path)
-        import mailgui
+    def test_encrypt_decrypt_roundtrip(self, mailgui_env):
+        mailgui = mailgui_env
         password = "my-secret-password"
         encrypted = mailgui._encrypt_password(password)
         assert encrypted != password
         decrypted = mailgui._decrypt_password(encrypted)
         assert decrypted == password
 
-    def test_empty_password(self, tmp_path):
-        _setup_env(tmp_path)
-        import mailgui
+    def test_empty_password(self, mailgui_env):
+        mailgui = mailgui_env
         assert mailgui._encrypt_password("") == ""
         assert mailgui._decrypt_password("") == ""
 
-    def test_unicode_password(self, tmp_path):
-        _setup_env(tmp_path)
-        import mailgui
+    def test_unicode_password(self, mailgui_env):
+        mailgui = mailgui_env
         password = "密碼測試🔐"
         encrypted = mailgui._encrypt_password(password)
         decrypted = mailgui._decrypt_password(encrypted)
         assert decrypted == password
 
-    def test_different_encryptions_differ(self, tmp_path):
+    def test_different_encryptions_differ(self, mailgui_env):
         """Fernet uses random IV, so same plaintext produces different ciphertext."""
-        _setup_env(tmp_path)
-        import mailgui
+        mailgui = mailgui_env
         password = "test123"
         enc1 = mailgui._encrypt_password(password)
         enc2 = mailgui._encrypt_password(password)
@@ -74,16 +88,48 @@ class TestEncryptPassword:
 
 
 class TestDecryptPasswordBackwardCompat:
-    def test_plaintext_fallback(self, tmp_path):
+    @pytest.fixture(autouse=True)
+    def failing_fernet(self, monkeypatch):
+        """Only the fallback branch is under test: no key file, no real cipher."""
+        import mailgui
+        from cryptography.fernet import InvalidToken
+        fernet = Mock()
+        fernet.decrypt.side_effect = InvalidToken
+        monkeypatch.setattr(mailgui, "_get_fernet", lambda: fernet)
+        return fernet
+
+    def test_plaintext_fallback(self, failing_fernet):
         """If decryption fails, return as-is (backward compatibility)."""
-        _setup_env(tmp_path)
         import mailgui
         plaintext = "old-plaintext-password"
         result = mailgui._decrypt_password(plaintext)
         assert result == plaintext
+        failing_fernet.decrypt.assert_called_once_with(plaintext.encode())
 
-    def test_invalid_token_fallback(self, tmp_path):
-        _setup_env(tmp_path)
+    def test_invalid_token_fallback(self):
         import mailgui
         result = mailgui._decrypt_password("not-a-valid-fernet-token")
         assert result == "not-a-valid-fernet-token"
+
+
+class TestAesNiCheck:
+    def test_flag_present(self, tmp_path, monkeypatch):
+        import mailgui
+        monkeypatch.setattr(mailgui.sys, "platform", "linux")
+        monkeypatch.setattr(mailgui.platform, "machine", lambda: "x86_64")
+        cpuinfo = tmp_path / "cpuinfo"
+        cpuinfo.write_text("processor\t: 0\nflags\t\t: fpu sse2 aes avx\n")
+        assert mailgui._aes_ni_available(str(cpuinfo)) is True
+
+    def test_flag_missing(self, tmp_path, monkeypatch):
+        import mailgui
+        monkeypatch.setattr(mailgui.sys, "platform", "linux")
+        monkeypatch.setattr(mailgui.platform, "machine", lambda: "x86_64")
+        cpuinfo = tmp_path / "cpuinfo"
+        cpuinfo.write_text("flags\t\t: fpu sse2 avx\n")
+        assert mailgui._aes_ni_available(str(cpuinfo)) is False
+
+    def test_unknown_platform(self, monkeypatch):
+        import mailgui
+        monkeypatch.setattr(mailgui.platform, "machine", lambda: "arm64")
+        assert mailgui._aes_ni_available() is None
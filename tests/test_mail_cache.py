@@ -13,6 +13,24 @@ def _make_cache(tmp_path):
     return cache
 
 
+@pytest.fixture(scope="module")
+def shared_cache():
+    """One in-memory MailCache (connection + schema) for the whole module."""
+    import mailgui
+    cache = mailgui.MailCache(":memory:")
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def cache(shared_cache):
+    """The shared cache, emptied before each test."""
+    with shared_cache._transaction():
+        shared_cache.conn.execute("DELETE FROM emails")
+        shared_cache.conn.execute("DELETE FROM emails_raw")
+    return shared_cache
+
+
 class TestMailCacheInit:
     def test_creates_db(self, tmp_path):
         cache = _make_cache(tmp_path)
@@ -29,10 +47,61 @@ class TestMailCacheInit:
             assert cur.fetchone() is not None
         cache.close()
 
+    def test_pragmas(self, tmp_path):
+        cache = _make_cache(tmp_path)
+        assert cache.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert cache.conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert cache.conn.execute("PRAGMA temp_store").fetchone()[0] == 2  # MEMORY
+        assert cache.conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert cache.conn.isolation_level is None
+        cache.close()
+
+
+class TestMailCacheQueryPlans:
+    def _plan(self, cache, sql, params):
+        return " ".join(r[3] for r in cache.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+    def test_load_list_uses_date_index(self, shared_cache):
+        import mailgui
+        plan = self._plan(shared_cache, mailgui._LOAD_LIST_SQL, ("a", "INBOX"))
+        assert "idx_emails_date" in plan
+        assert "TEMP B-TREE" not in plan  # no separate sort step
+
+    def test_get_uids_covered_by_primary_key(self, shared_cache):
+        import mailgui
+        plan = self._plan(shared_cache, mailgui._GET_UIDS_SQL, ("a", "INBOX"))
+        assert "COVERING INDEX" in plan
+
+
+class TestMailCacheMigration:
+    def test_adds_date_ts_to_old_cache(self, tmp_path):
+        import mailgui
+        db_path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("""CREATE TABLE emails (
+            account TEXT NOT NULL, folder TEXT NOT NULL, uid TEXT NOT NULL,
+            flags TEXT DEFAULT '', from_addr TEXT DEFAULT '', subject TEXT DEFAULT '',
+            date_str TEXT DEFAULT '', raw BLOB, PRIMARY KEY (account, folder, uid))""")
+        conn.executemany("INSERT INTO emails VALUES (?,?,?,?,?,?,?,?)", [
+            ("acct1", "INBOX", "1", "", "a@b.com", "New", "Wed, 04 Feb 2026 09:00:00 +0000", b"raw1"),
+            ("acct1", "INBOX", "2", "", "a@b.com", "Old", "Mon, 02 Feb 2026 10:00:00 +0800", None),
+        ])
+        conn.commit()
+        conn.close()
+
+        cache = mailgui.MailCache(db_path)
+        assert [r[3] for r in cache.load_list("acct1", "INBOX")] == ["New", "Old"]
+        # Bodies moved to emails_raw
+        assert cache.load_raw("acct1", "INBOX", "1") == b"raw1"
+        assert cache.load_raw("acct1", "INBOX", "2") is None
+        columns = {row[1] for row in cache.conn.execute("PRAGMA table_info(emails)")}
+        assert "raw" not in columns or cache.conn.execute(
+            "SELECT COUNT(*) FROM emails WHERE raw IS NOT NULL").fetchone()[0] == 0
+        cache.close()
+
 
 class TestMailCacheOperations:
-    def test_store_and_load_list(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_store_and_load_list(self, cache):
         messages = [
             ("uid1", "\\Seen", "alice@test.com", "Hello", "2026-02-20", None),
             ("uid2", "", "bob@test.com", "World", "2026-02-20", None),
@@ -44,25 +113,43 @@ class TestMailCacheOperations:
         uids = {r[0] for r in result}
         assert "uid1" in uids
         assert "uid2" in uids
-        cache.close()
 
-    def test_load_raw(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_load_list_row_factory(self, cache):
+        import mailgui
+        cache.store_batch("acct1", "INBOX", [("uid1", "\\Seen", "Alice <a@b.com>", "Hi", "d1", None)])
+        (msg,) = cache.load_list("acct1", "INBOX", mailgui._cached_msg_row)
+        assert isinstance(msg, mailgui.CachedMsg)
+        assert (msg.uid, msg.flags, msg.subject_lower) == ("uid1", "\\Seen", "hi")
+        # Default rows are still plain tuples
+        assert cache.load_list("acct1", "INBOX")[0][0] == "uid1"
+
+    def test_load_raw(self, cache):
         raw_bytes = b"From: test@test.com\r\nSubject: Test\r\n\r\nBody"
         messages = [("uid1", "", "test@test.com", "Test", "2026-02-20", raw_bytes)]
         cache.store_batch("acct1", "INBOX", messages)
         loaded = cache.load_raw("acct1", "INBOX", "uid1")
         assert loaded == raw_bytes
-        cache.close()
 
-    def test_load_raw_missing(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_store_raw(self, cache):
+        cache.store_batch("acct1", "INBOX", [("uid1", "", "a@b.com", "S1", "d1", None)])
+        assert cache.load_raw("acct1", "INBOX", "uid1") is None
+        cache.store_raw("acct1", "INBOX", "uid1", b"Subject: S1\r\n\r\nBody")
+        assert cache.load_raw("acct1", "INBOX", "uid1") == b"Subject: S1\r\n\r\nBody"
+
+    def test_store_raw_unknown_uid_ignored(self, cache):
+        cache.store_raw("acct1", "INBOX", "ghost", b"x")
+        assert cache.load_raw("acct1", "INBOX", "ghost") is None
+
+    def test_delete_removes_raw(self, cache):
+        cache.store_batch("acct1", "INBOX", [("uid1", "", "a@b.com", "S1", "d1", b"body")])
+        cache.delete("acct1", "INBOX", "uid1")
+        assert cache.load_raw("acct1", "INBOX", "uid1") is None
+
+    def test_load_raw_missing(self, cache):
         result = cache.load_raw("acct1", "INBOX", "nonexistent")
         assert result is None
-        cache.close()
 
-    def test_get_uids(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_get_uids(self, cache):
         messages = [
             ("uid1", "", "a@b.com", "S1", "2026-01-01", None),
             ("uid2", "", "c@d.com", "S2", "2026-01-02", None),
@@ -70,29 +157,63 @@ class TestMailCacheOperations:
         cache.store_batch("acct1", "INBOX", messages)
         uids = cache.get_uids("acct1", "INBOX")
         assert uids == {"uid1", "uid2"}
-        cache.close()
 
-    def test_delete(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_max_uid(self, cache):
+        assert cache.max_uid("acct1", "INBOX") == 0
+        messages = [
+            ("9", "", "a@b.com", "S1", "2026-01-01", None),
+            ("10", "", "c@d.com", "S2", "2026-01-02", None),
+        ]
+        cache.store_batch("acct1", "INBOX", messages)
+        # Numeric, not lexicographic, comparison
+        assert cache.max_uid("acct1", "INBOX") == 10
+        assert cache.max_uid("acct1", "Sent") == 0
+
+    def test_max_uid_ignores_pop3_uidls(self, cache):
+        messages = [
+            ("12", "", "a@b.com", "S1", "2026-01-01", None),
+            ("99999abc", "", "c@d.com", "S2", "2026-01-02", None),
+            ("000500ff", "", "e@f.com", "S3", "2026-01-03", None),
+        ]
+        cache.store_batch("acct1", "INBOX", messages)
+        assert cache.max_uid("acct1", "INBOX") == 12
+
+    def test_delete(self, cache):
         messages = [("uid1", "", "a@b.com", "S1", "2026-01-01", None)]
         cache.store_batch("acct1", "INBOX", messages)
         cache.delete("acct1", "INBOX", "uid1")
         uids = cache.get_uids("acct1", "INBOX")
         assert "uid1" not in uids
-        cache.close()
 
-    def test_store_batch_ignore_duplicate(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_store_batch_ignore_duplicate(self, cache):
         messages = [("uid1", "", "a@b.com", "S1", "2026-01-01", None)]
         cache.store_batch("acct1", "INBOX", messages)
         # Store same uid again — should not raise
         cache.store_batch("acct1", "INBOX", messages)
         uids = cache.get_uids("acct1", "INBOX")
         assert len(uids) == 1
-        cache.close()
 
-    def test_separate_accounts(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_load_list_newest_first(self, cache):
+        messages = [
+            ("1", "", "a@b.com", "Middle", "Tue, 03 Feb 2026 10:00:00 +0800", None),
+            ("2", "", "a@b.com", "Newest", "Wed, 04 Feb 2026 09:00:00 +0000", None),
+            ("3", "", "a@b.com", "Oldest", "Mon, 02 Feb 2026 10:00:00 +0800", None),
+            ("4", "", "a@b.com", "Undated", "", None),
+        ]
+        cache.store_batch("acct1", "INBOX", messages)
+        subjects = [r[3] for r in cache.load_list("acct1", "INBOX")]
+        assert subjects == ["Newest", "Middle", "Oldest", "Undated"]
+
+    def test_store_batch_rolls_back_on_error(self, cache):
+        messages = [
+            ("uid1", "", "a@b.com", "S1", "2026-01-01", None),
+            ("uid2", "", "c@d.com", {"not": "bindable"}, "2026-01-02", None),
+        ]
+        with pytest.raises(sqlite3.Error):
+            cache.store_batch("acct1", "INBOX", messages)
+        assert cache.get_uids("acct1", "INBOX") == set()
+
+    def test_separate_accounts(self, cache):
         cache.store_batch("acct1", "INBOX", [("uid1", "", "a@b.com", "S1", "d1", None)])
         cache.store_batch("acct2", "INBOX", [("uid1", "", "c@d.com", "S2", "d2", None)])
         uids1 = cache.get_uids("acct1", "INBOX")
@@ -103,14 +224,11 @@ class TestMailCacheOperations:
         list2 = cache.load_list("acct2", "INBOX")
         assert list1[0][3] == "S1"  # subject is at index 3
         assert list2[0][3] == "S2"
-        cache.close()
 
-    def test_separate_folders(self, tmp_path):
-        cache = _make_cache(tmp_path)
+    def test_separate_folders(self, cache):
         cache.store_batch("acct1", "INBOX", [("uid1", "", "a@b.com", "Inbox", "d1", None)])
         cache.store_batch("acct1", "Sent", [("uid1", "", "a@b.com", "Sent", "d1", None)])
         inbox_list = cache.load_list("acct1", "INBOX")
         sent_list = cache.load_list("acct1", "Sent")
         assert inbox_list[0][3] == "Inbox"
         assert sent_list[0][3] == "Sent"
-        cache.close()
@@ -0,0 +1,39 @@
+"""Tests for MailConfig load/save."""
+import json
+import os
+import pytest
+
+
+@pytest.fixture
+def config_env(tmp_path):
+    import mailgui
+    mailgui.CONFIG_FILE = str(tmp_path / "config.json")
+    mailgui.KEY_FILE = str(tmp_path / ".mailgui.key")
+    return mailgui
+
+
+class TestMailConfig:
+    def test_creates_default(self, config_env):
+        cfg = config_env.MailConfig()
+        assert os.path.exists(config_env.CONFIG_FILE)
+        assert not os.path.exists(config_env.CONFIG_FILE + ".tmp")
+        assert oct(os.stat(config_env.CONFIG_FILE).st_mode & 0o777) == "0o600"
+        assert cfg.get("recv_protocol") == "pop3"
+
+    def test_password_roundtrip_encrypted(self, config_env):
+        cfg = config_env.MailConfig()
+        cfg.set("password", "s3cret")
+        cfg.save()
+        with open(config_env.CONFIG_FILE, encoding="utf-8") as f:
+            assert json.load(f)["password"] != "s3cret"
+        assert config_env.MailConfig().get("password") == "s3cret"
+
+    def test_unchanged_save_skips_write(self, config_env):
+        cfg = config_env.MailConfig()
+        mtime = os.stat(config_env.CONFIG_FILE).st_mtime_ns
+        os.utime(config_env.CONFIG_FILE, ns=(mtime - 10**9, mtime - 10**9))
+        cfg.save()
+        assert os.stat(config_env.CONFIG_FILE).st_mtime_ns == mtime - 10**9
+        cfg.set("name", "Luna")
+        cfg.save()
+        assert os.stat(config_env.CONFIG_FILE).st_mtime_ns != mtime - 10**9
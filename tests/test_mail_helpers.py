@@ -0,0 +1,209 @@
+"""Tests for message parsing/building helpers."""
+import email
+import os
+import pytest
+
+
+class TestBuildPlainMessage:
+    def test_roundtrip(self):
+        import mailgui
+        raw = mailgui._build_plain_message(
+            "Luna <luna@test.com>", "bob@test.com", "Hello", "line1\nline2", cc="c@test.com")
+        msg = email.message_from_bytes(raw)
+        assert msg["From"] == "Luna <luna@test.com>"
+        assert msg["To"] == "bob@test.com"
+        assert msg["Cc"] == "c@test.com"
+        assert msg["Subject"] == "Hello"
+        assert msg["Content-Transfer-Encoding"] == "7bit"
+        assert msg.get_payload(decode=True) == b"line1\r\nline2"
+
+    def test_unicode_subject_and_body(self):
+        import mailgui
+        raw = mailgui._build_plain_message("a@test.com", "b@test.com", "主旨測試", "內容")
+        msg = email.message_from_bytes(raw)
+        assert mailgui._decode_header(msg["Subject"]) == "主旨測試"
+        assert msg["Content-Transfer-Encoding"] == "8bit"
+        assert msg.get_payload(decode=True).decode("utf-8") == "內容"
+
+    def test_no_cc_header(self):
+        import mailgui
+        raw = mailgui._build_plain_message("a@test.com", "b@test.com", "S", "body")
+        assert b"\r\nCc:" not in raw
+
+    def test_header_injection_falls_back(self):
+        import mailgui
+        assert mailgui._build_plain_message("a@test.com", "b@test.com", "S\r\nBcc: x@y", "body") is None
+
+    def test_long_line_falls_back(self):
+        import mailgui
+        assert mailgui._build_plain_message("a@test.com", "b@test.com", "S", "x" * 1000) is None
+
+    def test_non_ascii_address_falls_back(self):
+        import mailgui
+        assert mailgui._build_plain_message("露娜 <a@test.com>", "b@test.com", "S", "body") is None
+
+
+class TestAttachmentPath:
+    def test_plain_name(self):
+        import mailgui
+        assert mailgui._attachment_path("/out", "report.pdf") == os.path.join("/out", "report.pdf")
+
+    def test_strips_directories(self):
+        import mailgui
+        assert mailgui._attachment_path("/out", "../../etc/passwd") == os.path.join("/out", "passwd")
+        assert mailgui._attachment_path("/out", "..\\..\\evil.exe") == os.path.join("/out", "evil.exe")
+
+    def test_empty_name(self):
+        import mailgui
+        assert mailgui._attachment_path("/out", "..") == os.path.join("/out", "unnamed")
+
+    def test_repeated_names_numbered(self):
+        import mailgui
+        paths = mailgui._attachment_paths(
+            "/out", ["image001.png", "image001.png", "a/image001.png", "", "..", "README"])
+        assert paths == [os.path.join("/out", n) for n in (
+            "image001.png", "image001 (1).png", "image001 (2).png",
+            "unnamed", "unnamed (1)", "README")]
+
+
+class TestCachedMsg:
+    def test_from_cache_row(self):
+        import mailgui
+        m = mailgui.CachedMsg(*("7", "\\Seen", "Alice <A@Test.com>", "Hello World", "d1"))
+        assert m.uid == "7"
+        assert m.from_lower == "alice <a@test.com>"
+        assert m.subject_lower == "hello world"
+
+    def test_display_columns_truncated(self):
+        import mailgui
+        m = mailgui.CachedMsg("1", "", "f" * 50, "s" * 100, "d" * 30)
+        assert m.display_from == "f" * 40
+        assert m.display_subject == "s" * 80
+        assert m.display_date == "d" * 25
+
+
+class TestAttachmentPart:
+    def test_roundtrip_multi_block(self, tmp_path):
+        import mailgui
+        data = os.urandom(57 * 1024 * 2 + 100)
+        path = tmp_path / "blob.bin"
+        path.write_bytes(data)
+        part = mailgui._attachment_part(str(path))
+        assert part["Content-Transfer-Encoding"] == "base64"
+        assert part.get_filename() == "blob.bin"
+        assert part.get_payload(decode=True) == data
+
+    def test_empty_file(self, tmp_path):
+        import mailgui
+        path = tmp_path / "empty.txt"
+        path.write_bytes(b"")
+        assert mailgui._attachment_part(str(path)).get_payload(decode=True) == b""
+
+
+class TestDecodeHeader:
+    def test_plain(self):
+        import mailgui
+        assert mailgui._decode_header("Hello") == "Hello"
+        assert mailgui._decode_header("") == ""
+
+    def test_encoded_word(self):
+        import mailgui
+        assert mailgui._decode_header("=?utf-8?b?5ris6Kmm?=") == "測試"
+
+    def test_latin1_label_decodes_as_cp1252(self):
+        import mailgui
+        # 0x93/0x94 are curly quotes in cp1252, C1 controls in real Latin-1
+        assert mailgui._decode_header("=?iso-8859-1?q?=93hi=94?=") == "\u201chi\u201d"
+
+    def test_unknown_charset_falls_back(self):
+        import mailgui
+        assert mailgui._decode_header("=?x-bogus?q?abc?=") == "abc"
+
+    def test_non_text_codec_falls_back(self):
+        import mailgui
+        assert mailgui._decode_header("=?base64?q?abc?=") == "abc"
+        assert mailgui._decode_header("=?hex?q?41?=") == "41"
+        assert mailgui._decode_header("=?rot13?q?abc?=") == "abc"
+
+
+class TestGetBody:
+    def _multipart(self, *parts):
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        msg = MIMEMultipart("alternative")
+        for body, subtype in parts:
+            msg.attach(MIMEText(body, subtype, "utf-8"))
+        return email.message_from_bytes(msg.as_bytes())
+
+    def test_first_plain_and_html_win(self):
+        import mailgui
+        msg = self._multipart(("one", "plain"), ("<b>one</b>", "html"),
+                              ("two", "plain"), ("<b>two</b>", "html"))
+        assert mailgui._get_body(msg) == ("one", "<b>one</b>")
+
+    def test_stops_after_both_found(self):
+        import mailgui
+        msg = self._multipart(("one", "plain"), ("<b>one</b>", "html"), ("two", "plain"))
+        last = msg.get_payload()[-1]
+        last.get_payload = lambda *a, **k: pytest.fail("walked past both bodies")
+        assert mailgui._get_body(msg) == ("one", "<b>one</b>")
+
+    def test_flat_html(self):
+        import mailgui
+        msg = email.message_from_bytes(
+            b"Content-Type: text/html; charset=utf-8\r\n\r\n<p>hi</p>")
+        assert mailgui._get_body(msg) == ("", "<p>hi</p>")
+
+    def test_flat_plain_without_content_type(self):
+        import mailgui
+        msg = email.message_from_bytes(b"Subject: x\r\n\r\nhello")
+        assert mailgui._get_body(msg) == ("hello", "")
+
+    def test_flat_non_text_not_decoded(self):
+        import mailgui
+        msg = email.message_from_bytes(
+            b"Content-Type: application/octet-stream\r\n\r\n\xff\xfe")
+        assert mailgui._get_body(msg) == ("", "")
+
+
+class TestGetAttachments:
+    def test_lazy_part(self):
+        import mailgui
+        from email.mime.multipart import MIMEMultipart
+        from email.mime.text import MIMEText
+        from email.mime.application import MIMEApplication
+        data = os.urandom(3000)
+        outer = MIMEMultipart()
+        outer.attach(MIMEText("body", "plain", "utf-8"))
+        att = MIMEApplication(data)
+        att.add_header("Content-Disposition", "attachment", filename="report.pdf")
+        outer.attach(att)
+        msg = email.message_from_bytes(outer.as_bytes())
+
+        (found,) = mailgui._get_attachments(msg)
+        assert found["filename"] == "report.pdf"
+        assert "data" not in found
+        assert abs(found["size"] - len(data)) < len(data) * 0.05
+        assert mailgui._attachment_data(found) == data
+
+    def test_flat_message_has_none(self):
+        import mailgui
+        msg = email.message_from_bytes(b"Subject: x\r\n\r\nhello")
+        assert mailgui._get_attachments(msg) == []
+
+    def test_preloaded_data(self):
+        import mailgui
+        assert mailgui._attachment_data({"filename": "a", "data": b"xyz"}) == b"xyz"
+        assert mailgui._attachment_data({"filename": "a", "data": None}) == b""
+
+
+class TestDateTs:
+    def test_rfc2822(self):
+        import mailgui
+        assert mailgui._date_ts("Thu, 01 Jan 1970 00:01:00 +0000") == 60
+
+    def test_unparseable(self):
+        import mailgui
+        assert mailgui._date_ts("") == 0
+        assert mailgui._date_ts("2026-02-20") == 0
+        assert mailgui._date_ts(None) == 0
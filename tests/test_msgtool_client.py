@@ -2,7 +2,7 @@
 import json
 import pytest
 from unittest.mock import patch, MagicMock
-from msgtool_client import MsgClient
+from msgtool_client import AsyncMsgClient, MsgClient
 
 
 class TestMsgClientInit:
@@ -44,77 +44,210 @@ class TestMsgClientHeaders:
         assert headers["X-Password"] == "secret"
         assert headers["Content-Type"] == "application/json"
 
+    def test_headers_cached(self):
+        client = MsgClient(user="luna", password="secret")
+        assert client._headers() is client._headers()
+
+    def test_headers_follow_credential_change(self):
+        client = MsgClient(user="luna", password="secret")
+        client._headers()
+        client.password = "new"
+        assert client._headers()["X-Password"] == "new"
+
+
+class _FakeResp:
+    """Minimal stand-in for http.client.HTTPResponse."""
+
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+
+    def read(self):
+        return self._body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
 
 class TestMsgClientGet:
-    @patch("msgtool_client.urllib.request.urlopen")
-    def test_get_success(self, mock_urlopen):
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_get_success(self, mock_conn_cls):
         resp_data = {"status": "ok"}
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = json.dumps(resp_data).encode()
-        mock_resp.__enter__ = lambda s: s
-        mock_resp.__exit__ = MagicMock(return_value=False)
-        mock_urlopen.return_value = mock_resp
+        conn = mock_conn_cls.return_value
+        conn.getresponse.return_value = _FakeResp(200, json.dumps(resp_data).encode())
 
         client = MsgClient(server_url="http://test:8900")
         result = client._get("/health")
         assert result == resp_data
+        mock_conn_cls.assert_called_once_with("test:8900", timeout=10)
 
-    @patch("msgtool_client.urllib.request.urlopen")
-    def test_get_with_params(self, mock_urlopen):
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = b'{"items": []}'
-        mock_resp.__enter__ = lambda s: s
-        mock_resp.__exit__ = MagicMock(return_value=False)
-        mock_urlopen.return_value = mock_resp
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_get_with_params(self, mock_conn_cls):
+        conn = mock_conn_cls.return_value
+        conn.getresponse.return_value = _FakeResp(200, b'{"items": []}')
 
         client = MsgClient(server_url="http://test:8900")
         client._get("/inbox", {"limit": "10", "unread": "1"})
-        call_args = mock_urlopen.call_args
-        url = call_args[0][0].full_url
+        method, url = conn.request.call_args[0]
+        assert method == "GET"
+        assert url.startswith("/inbox?")
         assert "limit=10" in url
         assert "unread=1" in url
 
-    @patch("msgtool_client.urllib.request.urlopen")
-    def test_get_http_error_json(self, mock_urlopen):
-        import urllib.error
-        error_body = json.dumps({"error": "not found"}).encode()
-        mock_fp = MagicMock()
-        mock_fp.read.return_value = error_body
-        error = urllib.error.HTTPError("http://test", 404, "Not Found", {}, mock_fp)
-        error.fp = mock_fp
-        mock_urlopen.side_effect = error
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_get_http_error_json(self, mock_conn_cls):
+        conn = mock_conn_cls.return_value
+        conn.getresponse.return_value = _FakeResp(404, json.dumps({"error": "not found"}).encode())
 
         client = MsgClient(server_url="http://test:8900")
         result = client._get("/missing")
         assert result == {"error": "not found"}
 
-    @patch("msgtool_client.urllib.request.urlopen")
-    def test_get_connection_error(self, mock_urlopen):
-        mock_urlopen.side_effect = ConnectionError("refused")
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_get_http_error_text(self, mock_conn_cls):
+        conn = mock_conn_cls.return_value
+        conn.getresponse.return_value = _FakeResp(500, b"boom")
+
+        client = MsgClient(server_url="http://test:8900")
+        assert client._get("/health") == {"error": "HTTP 500: boom"}
+
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_get_connection_error(self, mock_conn_cls):
+        mock_conn_cls.return_value.request.side_effect = ConnectionError("refused")
 
         client = MsgClient(server_url="http://test:8900")
         result = client._get("/health")
         assert "error" in result
+        # A fresh connection that fails is not retried
+        assert mock_conn_cls.call_count == 1
+
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_connection_reused(self, mock_conn_cls):
+        conn = mock_conn_cls.return_value
+        conn.getresponse.side_effect = lambda: _FakeResp(200, b"{}")
+
+        client = MsgClient(server_url="http://test:8900")
+        client._get("/health")
+        client._get("/notify")
+        assert mock_conn_cls.call_count == 1
+        assert conn.request.call_count == 2
+
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_stale_connection_retried_once(self, mock_conn_cls):
+        import http.client
+        stale, fresh = MagicMock(), MagicMock()
+        stale.getresponse.side_effect = [_FakeResp(200, b"{}"),
+                                         http.client.RemoteDisconnected("closed")]
+        fresh.getresponse.return_value = _FakeResp(200, b'{"ok": 1}')
+        mock_conn_cls.side_effect = [stale, fresh]
+
+        client = MsgClient(server_url="http://test:8900")
+        client._get("/health")
+        assert client._get("/notify") == {"ok": 1}
+        stale.close.assert_called_once()
+
+    def test_release_after_close_closes_connection(self):
+        client = MsgClient(server_url="http://test:8900")
+        conn = MagicMock()
+        client.close()
+        # A request that was in flight during close() finishes afterwards
+        client._release(conn)
+        conn.close.assert_called_once()
+        assert client._idle == []
+
+    @patch("msgtool_client.http.client.HTTPSConnection")
+    def test_https_with_base_path(self, mock_conn_cls):
+        conn = mock_conn_cls.return_value
+        conn.getresponse.return_value = _FakeResp(200, b"{}")
+
+        client = MsgClient(server_url="https://test/api")
+        client._get("/health")
+        mock_conn_cls.assert_called_once_with("test", timeout=10)
+        assert conn.request.call_args[0] == ("GET", "/api/health")
 
 
 class TestMsgClientPost:
-    @patch("msgtool_client.urllib.request.urlopen")
-    def test_post_success(self, mock_urlopen):
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_post_success(self, mock_conn_cls):
         resp_data = {"ok": True}
-        mock_resp = MagicMock()
-        mock_resp.read.return_value = json.dumps(resp_data).encode()
-        mock_resp.__enter__ = lambda s: s
-        mock_resp.__exit__ = MagicMock(return_value=False)
-        mock_urlopen.return_value = mock_resp
+        conn = mock_conn_cls.return_value
+        conn.getresponse.return_value = _FakeResp(200, json.dumps(resp_data).encode())
 
         client = MsgClient(server_url="http://test:8900")
         result = client._post("/send", {"to": "bob", "msg": "hi"})
         assert result == {"ok": True}
+        assert conn.request.call_args[0] == ("POST", "/send")
+        assert json.loads(conn.request.call_args[1]["body"]) == {"to": "bob", "msg": "hi"}
+
+
+class TestMsgClientGetCache:
+    @patch.object(MsgClient, "_call")
+    def test_repeat_get_served_from_cache(self, mock_call):
+        mock_call.return_value = {"unread": 1}
+        client = MsgClient(server_url="http://test:8900")
+        assert client._get("/notify") == {"unread": 1}
+        assert client._get("/notify") == {"unread": 1}
+        mock_call.assert_called_once_with("GET", "/notify")
+        client._get("/notify", {"x": "1"})
+        assert mock_call.call_count == 2
+
+    @patch.object(MsgClient, "_call")
+    def test_expires_after_ttl(self, mock_call):
+        mock_call.return_value = {"ok": 1}
+        client = MsgClient(server_url="http://test:8900")
+        with patch("msgtool_client.time.monotonic", return_value=100.0):
+            client._get("/health")
+        with patch("msgtool_client.time.monotonic", return_value=101.5):
+            client._get("/health")
+        assert mock_call.call_count == 2
+
+    @patch.object(MsgClient, "_call")
+    def test_errors_not_cached(self, mock_call):
+        mock_call.return_value = {"error": "down"}
+        client = MsgClient(server_url="http://test:8900")
+        client._get("/health")
+        client._get("/health")
+        assert mock_call.call_count == 2
+
+    @patch.object(MsgClient, "_call")
+    def test_post_invalidates(self, mock_call):
+        mock_call.return_value = {"messages": []}
+        client = MsgClient(server_url="http://test:8900")
+        client.inbox()
+        client.send("bob", "hi")
+        client.inbox()
+        assert [c[0][0] for c in mock_call.call_args_list] == ["GET", "POST", "GET"]
+
+    @patch.object(MsgClient, "_call")
+    def test_read_bypasses_cache_and_invalidates(self, mock_call):
+        mock_call.return_value = {"messages": []}
+        client = MsgClient(server_url="http://test:8900")
+        client.inbox()
+        client.read(1)
+        client.read(1)
+        client.inbox()
+        assert [c[0][1] for c in mock_call.call_args_list] == [
+            "/inbox?limit=50", "/read/1", "/read/1", "/inbox?limit=50"]
+
+
+class TestJsonCodec:
+    def test_roundtrip(self):
+        import msgtool_client
+        data = {"to": "bob", "msg": "你好", "n": 3, "ok": True, "items": [None]}
+        encoded = msgtool_client._dumps(data)
+        assert isinstance(encoded, bytes)
+        assert msgtool_client._loads(encoded) == data
+        assert json.loads(encoded) == data
 
 
 class TestMsgClientMethods:
-    def setup_method(self):
-        self.client = MsgClient(server_url="http://test:8900", user="luna", password="pw")
+    @classmethod
+    def setup_class(cls):
+        # _get/_post are patched in every test, so one client serves them all
+        cls.client = MsgClient(server_url="http://test:8900", user="luna", password="pw")
 
     @patch.object(MsgClient, "_get")
     def test_health(self, mock_get):
@@ -139,7 +272,7 @@ class TestMsgClientMethods:
     def test_read(self, mock_get):
         mock_get.return_value = {"body": "hello"}
         self.client.read("msg123")
-        mock_get.assert_called_once_with("/read/msg123")
+        mock_get.assert_called_once_with("/read/msg123", cache=False)
 
     @patch.object(MsgClient, "_post")
     def test_send(self, mock_post):
@@ -166,3 +299,40 @@ class TestMsgClientMethods:
         mock_post.assert_called_once_with("/register", {
             "username": "newuser", "password": "pass123", "display_name": "New User"
         })
+
+
+class TestAsyncMsgClient:
+    @patch("msgtool_client.http.client.HTTPConnection")
+    def test_gathered_calls_overlap(self, mock_conn_cls):
+        import asyncio
+        import threading
+        # Both requests must be in flight at once to get past the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def getresponse():
+            barrier.wait()
+            return _FakeResp(200, b'{"ok": 1}')
+
+        def make_conn(*args, **kwargs):
+            conn = MagicMock()
+            conn.getresponse.side_effect = getresponse
+            return conn
+        mock_conn_cls.side_effect = make_conn
+
+        client = AsyncMsgClient(server_url="http://test:8900")
+
+        async def both():
+            return await asyncio.gather(client.inbox(), client.sent())
+        assert asyncio.run(both()) == [{"ok": 1}, {"ok": 1}]
+        assert mock_conn_cls.call_count == 2
+        # Both connections went back to the pool for reuse
+        assert len(client.client._idle) == 2
+        client.close()
+        assert client.client._idle == []
+
+    def test_delegates_arguments(self):
+        import asyncio
+        client = AsyncMsgClient(server_url="http://test:8900")
+        with patch.object(MsgClient, "_post", return_value={"ok": True}) as mock_post:
+            asyncio.run(client.send("bob", "hi", reply_to="msg1"))
+        mock_post.assert_called_once_with("/send", {"to": "bob", "msg": "hi", "reply_to": "msg1"})